@@ -0,0 +1,67 @@
+from proof import Proof
+
+# AND/OR trees of states, shared by the searches which keep the whole tree: parallel and best-first
+
+# Kinds of nodes
+STATE = "state" # a state, proved by any of its alternatives
+ALL = "all" # deterministic result of an action, all its states have to be proved
+ANY = "any" # indeterministic result of an action (or instantiations), any of its states has to be proved
+
+class Node:
+
+    __slots__ = ("kind","state","action","parent","index","children","proofs","open","done","single","cyclic")
+
+    def __init__(self,kind,state,parent,index,action = None) -> None:
+        self.kind = kind
+        self.state = state
+        self.action = action
+        self.parent = parent
+        # Position of the node among children of its parent
+        self.index = index
+        self.children = []
+        self.proofs = []
+        # Number of children which have not failed (ANY, STATE) or have not been proved (ALL) yet
+        self.open = 0
+        self.done = False
+        # Whether an ALL node comes from an action with a single resulting state
+        self.single = False
+        # Whether the node failed, or some of its failed children did, only because a state repeated its ancestor
+        self.cyclic = False
+
+def resolve(node,proof,visit,cyclic = False) -> None:
+    # Propagate the result of the node towards the root, cyclic marks a failure caused by a repeated state
+    # visit(node, proof) is called for every node getting resolved and returns the proof passed to its parent
+    while not node.done:
+        node.done = True
+        node.cyclic = cyclic = node.cyclic or (cyclic and not proof)
+        proof = visit(node,proof)
+        parent = node.parent
+        if parent is None or parent.done: return
+        # A state is proved by the first proved alternative and fails once all of them fail
+        if parent.kind == STATE:
+            if not proof:
+                parent.cyclic = parent.cyclic or cyclic
+                parent.open -= 1
+                if parent.open: return
+        # Any proved branch proves the indeterministic result
+        elif parent.kind == ANY:
+            if proof: proof = Proof(parent.state,parent.action.__name__,proof)
+            else:
+                parent.cyclic = parent.cyclic or cyclic
+                parent.open -= 1
+                if parent.open: return
+        # All branches of the deterministic result have to be proved
+        elif proof:
+            parent.proofs[node.index] = proof
+            parent.open -= 1
+            if parent.open: return
+            if parent.single: proof = Proof(parent.state,parent.action.__name__,proof)
+            else: proof = Proof(parent.state,parent.action.__name__,*parent.proofs,branching = True)
+        node = parent
+
+def resolved(node) -> bool:
+    # Check whether the node or any of its ancestors was already resolved
+    while node is not None:
+        if node.done: return True
+        node = node.parent
+    return False
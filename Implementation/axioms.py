@@ -1,4 +1,5 @@
-from connectives import Or,Not
+# Axioms look the assumptions up in the multiset kept by the state,
+# which is updated by every change of the formulas, so only the changed formulas are ever checked
 
 class Axiom:
     pass
@@ -7,16 +8,14 @@ class GoalAssumption(Axiom):
     
     @staticmethod
     def check(state):
-        for formula in state.formulas[:-1]:
-            if formula == state.formulas[-1]:
-                return "Goal in assumption"
+        if state.contains(state.formulas[-1]):
+            return "Goal in assumption"
         return False
 
 class ContradictionAssumption(Axiom):
     
     @staticmethod
     def check(state):
-        for formula in state.formulas[:-1]:
-            if formula == Or() or Not(formula) in state.formulas[:-1]:
-                return "Contradiction in assumption"
+        if state.contradictory():
+            return "Contradiction in assumption"
         return False
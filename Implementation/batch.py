@@ -0,0 +1,119 @@
+import argparse, glob, json, multiprocessing, multiprocessing.connection, os, resource, sys, time
+from formula_parser import parse
+from search import BUDGET_EXHAUSTED
+from solver import solve
+
+# Solve many QCIR files by a pool of worker processes and write one JSON line per file
+# Usage: python batch.py "../toy_tasks/*.qcir" --workers 8 --timeout 60
+
+# Seconds the search of a file gets after its time limit to stop by itself, before its process is killed
+kill_grace = 1.0
+
+def collect_files(patterns) -> list:
+    # Expand directories and glob patterns into a sorted list of files
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern): files += glob.glob(os.path.join(pattern,"*.qcir"))
+        else: files += glob.glob(pattern)
+    return sorted(set(files))
+
+def reset_peak_memory() -> None:
+    # On Linux, writing 5 to clear_refs resets the peak resident set size of the process
+    try:
+        with open("/proc/self/clear_refs","w") as clear_refs: clear_refs.write("5")
+    except OSError:
+        pass
+
+def peak_memory() -> int:
+    # Peak resident set size in bytes, since the last reset if it is supported
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"): return int(line.split()[1])*1024
+    except OSError:
+        pass
+    # Otherwise the peak of the whole worker process
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak*1024
+
+def solve_file(file,timeout = None,max_nodes = None) -> dict:
+    reset_peak_memory()
+    start = time.monotonic()
+    try:
+        state = parse(file)
+        # Parsing counts into the time limit of the file
+        if timeout is not None: timeout = max(timeout - (time.monotonic() - start),0)
+        result = solve(state,max_nodes = max_nodes,timeout = timeout)
+    # Any failure of a single file is reported as its result, the other files are solved on
+    except Exception as error:
+        return error_result(file,error,time.monotonic() - start)
+    return {"file":file,"verdict":result.status,"time":time.monotonic() - start,"nodes":result.stats["nodes"],
+            "tt_hits":result.stats["hits"],"peak_memory":peak_memory()}
+
+def error_result(file,error,elapsed = 0.0) -> dict:
+    return {"file":file,"verdict":"error","error":f"{error.__class__.__name__}: {error}","time":elapsed}
+
+def run_file(connection,file,timeout,max_nodes) -> None:
+    # Solve the file in a process of its own and send the result back
+    connection.send(solve_file(file,timeout,max_nodes))
+    connection.close()
+
+def solve_files(files,workers = None,timeout = None,max_nodes = None):
+    # Yield results of the files in the order they are solved
+    # Every file is solved in a process of its own, which is killed once it runs past the time limit,
+    # as parsing and single steps of the search do not check the time
+    workers = workers or os.cpu_count()
+    pending = list(reversed(files))
+    # Processes solving the files, with the files and their start times, by their connections
+    running = {}
+    try:
+        while pending or running:
+            while pending and len(running) < workers:
+                file = pending.pop()
+                receiver, sender = multiprocessing.Pipe(duplex = False)
+                process = multiprocessing.Process(target = run_file,args = (sender,file,timeout,max_nodes),daemon = True)
+                process.start()
+                sender.close()
+                running[receiver] = (process,file,time.monotonic())
+            # Wait for a result, at most until the earliest time limit passes
+            wait_time = None
+            if timeout is not None:
+                earliest = min(start for process,file,start in running.values())
+                wait_time = max(earliest + timeout + kill_grace - time.monotonic(),0)
+            for receiver in multiprocessing.connection.wait(list(running),wait_time):
+                process, file, start = running.pop(receiver)
+                try:
+                    result = receiver.recv()
+                # The process ended without a result, e.g. when it got killed for lack of memory
+                except EOFError:
+                    process.join()
+                    result = error_result(file,RuntimeError(f"worker process exited with code {process.exitcode}"),time.monotonic() - start)
+                receiver.close()
+                process.join()
+                yield result
+            if timeout is None: continue
+            now = time.monotonic()
+            for receiver,(process,file,start) in list(running.items()):
+                if now - start < timeout + kill_grace: continue
+                process.kill()
+                process.join()
+                receiver.close()
+                del running[receiver]
+                yield {"file":file,"verdict":BUDGET_EXHAUSTED,"time":now - start}
+    finally:
+        for receiver,(process,file,start) in running.items(): process.kill()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Solve QCIR files in parallel, writing one JSON line per file.")
+    parser.add_argument("patterns",nargs = "+",help = "QCIR files, directories or glob patterns")
+    parser.add_argument("--workers",type = int,default = None,help = "number of worker processes (default: number of CPUs)")
+    parser.add_argument("--timeout",type = float,default = None,help = "time limit per file in seconds")
+    parser.add_argument("--max-nodes",type = int,default = None,help = "limit of expanded states per file")
+    parser.add_argument("--output",default = None,help = "file to write the results to (default: standard output)")
+    args = parser.parse_args()
+
+    output = open(args.output,"w") if args.output else sys.stdout
+    for result in solve_files(collect_files(args.patterns),args.workers,args.timeout,args.max_nodes):
+        output.write(json.dumps(result) + "\n")
+        output.flush()
+    if args.output: output.close()
@@ -0,0 +1,133 @@
+import argparse, glob, json, os, platform, sys, time
+import numpy as np
+from collections import defaultdict
+from rules import State, Action
+from formula_parser import parse
+from task_generator import generate_formula
+from solver import solve
+from batch import reset_peak_memory, peak_memory
+
+# Reproducible benchmark of the prover on the toy tasks and on a fixed-seed generated corpus
+# Usage: python benchmark.py --levels 3 --output new.json
+#        python benchmark.py --compare old.json new.json
+
+class Timings:
+
+    # Measures time spent in wrapped functions, nested calls are counted only to the innermost one
+    def __init__(self) -> None:
+        self.totals = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.children = []
+        self.patched = []
+
+    def wrap(self,category,function):
+        def timed(*args,**kwargs):
+            start = time.perf_counter()
+            self.children.append(0.0)
+            try:
+                return function(*args,**kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                self.totals[category] += elapsed - self.children.pop()
+                self.calls[category] += 1
+                if self.children: self.children[-1] += elapsed
+        return timed
+
+    def patch(self,owner,name,category,static = False) -> None:
+        # Replace the attribute of the class by its timed version, it is restored by restore()
+        original = owner.__dict__[name]
+        function = original.__func__ if static else original
+        timed = self.wrap(category,function)
+        setattr(owner,name,staticmethod(timed) if static else timed)
+        self.patched.append((owner,name,original))
+
+    def __enter__(self):
+        self.patch(State,"possibleActions","possibleActions")
+        self.patch(State,"fitAxioms","fitAxioms")
+        self.patch(State,"__hash__","hashing")
+        # Time all actions, the abstract helpers their apply delegates to are counted within it
+        actions = Action.__subclasses__()
+        for action in actions:
+            if "applicable" in action.__dict__: self.patch(action,"applicable","applicable",static = True)
+            if "apply" in action.__dict__: self.patch(action,"apply","apply",static = True)
+        return self
+
+    def __exit__(self,*exception) -> None:
+        for owner,name,original in reversed(self.patched): setattr(owner,name,original)
+        self.patched = []
+
+def toy_corpus(directory) -> list:
+    return [(os.path.basename(file),file) for file in sorted(glob.glob(os.path.join(directory,"*.qcir")))]
+
+def generated_corpus(levels,per_level,seed) -> list:
+    # Formulas of the task generator at complexity 1 to levels, generated from a fixed seed
+    np.random.seed(seed)
+    corpus = []
+    for level in range(1,levels + 1):
+        for i in range(per_level):
+            corpus.append((f"generated-{level}-{i}",generate_formula(level)))
+    return corpus
+
+def run_instance(name,task,max_nodes,seed) -> dict:
+    # Every parsed instance gets its own symbol table, so that skolemn names do not depend on previous instances
+    if isinstance(task,str): task = parse(task)
+    reset_peak_memory()
+    with Timings() as timings:
+        start = time.perf_counter()
+        result = solve(task,max_nodes = max_nodes,seed = seed)
+        elapsed = time.perf_counter() - start
+    stats = result.stats
+    lookups = stats["hits"] + stats["misses"]
+    profile = dict(timings.totals)
+    profile["other"] = max(elapsed - sum(profile.values()),0.0)
+    return {"name":name,"status":result.status,"nodes":stats["nodes"],"time":elapsed,
+            "nodes_per_sec":stats["nodes"]/elapsed if elapsed else 0.0,
+            "tt_hit_rate":stats["hits"]/lookups if lookups else 0.0,
+            "peak_rss":peak_memory(),"time_split":profile,"calls":dict(timings.calls)}
+
+def run(toy_directory,levels,per_level,seed,max_nodes) -> dict:
+    instances = []
+    for name,task in toy_corpus(toy_directory) + generated_corpus(levels,per_level,seed):
+        instances.append(run_instance(name,task,max_nodes,seed))
+    total_time = sum(instance["time"] for instance in instances)
+    total_nodes = sum(instance["nodes"] for instance in instances)
+    return {"config":{"levels":levels,"per_level":per_level,"seed":seed,"max_nodes":max_nodes,
+                      "python":platform.python_version()},
+            "total":{"time":total_time,"nodes":total_nodes,"nodes_per_sec":total_nodes/total_time if total_time else 0.0,
+                     "proved":sum(instance["status"] == "proved" for instance in instances)},
+            "instances":instances}
+
+def compare(old,new) -> None:
+    # Print the change of speed and of the searched nodes of every instance
+    old_instances = {instance["name"]:instance for instance in old["instances"]}
+    print(f"{'instance':<20}{'status':>20}{'nodes':>16}{'nodes/sec':>24}")
+    for instance in new["instances"]:
+        previous = old_instances.get(instance["name"])
+        if previous is None: continue
+        status = instance["status"] if instance["status"] == previous["status"] else f"{previous['status']}->{instance['status']}"
+        speedup = instance["nodes_per_sec"]/previous["nodes_per_sec"] if previous["nodes_per_sec"] else float("nan")
+        print(f"{instance['name']:<20}{status:>20}{previous['nodes']:>8}->{instance['nodes']:<7}"
+              f"{previous['nodes_per_sec']:>10.0f}->{instance['nodes_per_sec']:<8.0f}x{speedup:.2f}")
+    speedup = new["total"]["nodes_per_sec"]/old["total"]["nodes_per_sec"] if old["total"]["nodes_per_sec"] else float("nan")
+    print(f"Total: {old['total']['nodes_per_sec']:.0f} -> {new['total']['nodes_per_sec']:.0f} nodes/sec (x{speedup:.2f}), "
+          f"proved {old['total']['proved']} -> {new['total']['proved']}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Reproducible benchmark of the prover.")
+    parser.add_argument("--toy-tasks",default = os.path.join(os.path.dirname(os.path.abspath(__file__)),"..","toy_tasks"))
+    parser.add_argument("--levels",type = int,default = 3,help = "generate formulas of complexity 1 to levels")
+    parser.add_argument("--per-level",type = int,default = 5,help = "number of generated formulas per complexity level")
+    parser.add_argument("--seed",type = int,default = 0)
+    parser.add_argument("--max-nodes",type = int,default = 20000,help = "limit of expanded states per instance")
+    parser.add_argument("--output",default = None,help = "file to write the JSON results to (default: standard output)")
+    parser.add_argument("--compare",nargs = 2,metavar = ("OLD","NEW"),help = "compare two result files instead of running")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as old, open(args.compare[1]) as new: compare(json.load(old),json.load(new))
+    else:
+        results = run(args.toy_tasks,args.levels,args.per_level,args.seed,args.max_nodes)
+        if args.output:
+            with open(args.output,"w") as output: json.dump(results,output,indent = 1)
+        else:
+            json.dump(results,sys.stdout,indent = 1)
@@ -0,0 +1,212 @@
+import heapq, itertools, time, weakref
+from connectives import children, postorder
+from search import Search, PROVED, NOT_FOUND, BUDGET_EXHAUSTED, CANCELLED
+from transposition import TranspositionTable
+import andor
+from andor import STATE, ALL, ANY
+from proof import Proof
+
+# Cost functions of the best-first search: cost(state, depth, parent, action) of a state at the given depth,
+# resulting from the action applied to the parent state (both None for the root)
+
+def depth_cost(state,depth,parent,action) -> float:
+    # Shorter proofs first
+    return depth
+
+# Numbers of nodes of already measured formulas
+sizes = weakref.WeakKeyDictionary()
+
+def formula_size(formula) -> int:
+    # Number of nodes of the formula, without recursion on deep formulas
+    for node in postorder(formula,sizes):
+        sizes[node] = 1 + sum(sizes[child] for child in children(node))
+    return sizes[formula]
+
+def size_cost(state,depth,parent,action) -> float:
+    # Smaller sequents first
+    return sum(formula_size(formula) for formula in state.formulas)
+
+def model_cost(model):
+    # Depth lowered by the quality the model predicts for the action which led to the state
+    def cost(state,depth,parent,action) -> float:
+        if parent is None: return depth
+        if getattr(parent,"qualities",None) is None: parent.qualities = model.qualities([parent])[0]
+        quality = parent.qualities.get(action,0.0)
+        # Actions the model does not know do not change the cost
+        return depth - (quality if quality != float("-inf") else 0.0)
+    return cost
+
+# Node of the AND/OR tree with its depth and cost
+class Node(andor.Node):
+
+    __slots__ = ("depth","cost","pending")
+
+    def __init__(self,kind,state,parent,index,action = None,depth = 0,cost = 0.0) -> None:
+        super().__init__(kind,state,parent,index,action)
+        self.depth = depth
+        self.cost = cost
+        # Generator of the instantiations of an ANY node not created yet
+        self.pending = None
+
+# Best-first AND/OR proof search: unexpanded states wait in a heap ordered by their cost,
+# the cheapest one is expanded first and results of states are backed up towards the root
+# States costing more than max_cost are not expanded and count as not proved,
+# with beam_width only that many of the cheapest alternatives of every state are searched
+# Instantiations of a sequent are created one at a time: the ANY node waits in the heap
+# with the cost of its last instantiation and creates the next one once it is popped
+class BestFirstSearch:
+
+    # Number of steps after which the time limit and cancellation are checked
+    check_interval = 64
+
+    def __init__(self,cost = depth_cost,beam_width = None,max_cost = None,seed = None,simplify = False) -> None:
+        self.cost = cost
+        self.beam_width = beam_width
+        self.max_cost = max_cost
+        # Alternatives of the states are generated as in the depth-first search
+        self.search = Search(TranspositionTable(),seed = seed,simplify = simplify)
+        # Without cutoffs and beam, failures of states not caused by a repeated state hold wherever the states appear again
+        self.exact = beam_width is None and max_cost is None
+        self.nodes = 0
+        self.cutoffs = 0
+        self.steps = 0
+        self.result = None
+        self.status = None
+
+    def run(self,root,max_nodes = None,deadline = None,cancelled = None):
+        # Search until the root is resolved, the heap runs out, the number of expanded states reaches max_nodes,
+        # time.monotonic() passes the deadline or cancelled() returns true
+        self.result = None
+        self.status = None
+        # Proofs and failures of already resolved states by their keys
+        self.proved = {}
+        self.failed = set()
+        self.heap = []
+        self.counter = itertools.count()
+        root_node = Node(STATE,root,None,0,cost = self.cost(root,0,None,None))
+        self.push(root_node)
+        while self.heap and not root_node.done:
+            node = heapq.heappop(self.heap)[2]
+            # Some of the node's ancestors may have been resolved meanwhile
+            if andor.resolved(node): continue
+            self.steps += 1
+            if max_nodes is not None and self.nodes >= max_nodes:
+                self.status = BUDGET_EXHAUSTED
+            elif not self.steps % BestFirstSearch.check_interval:
+                if deadline is not None and time.monotonic() >= deadline: self.status = BUDGET_EXHAUSTED
+                elif cancelled is not None and cancelled(): self.status = CANCELLED
+            if self.status is not None:
+                self.heap = []
+                return None
+            if node.kind == ANY: self.advance(node)
+            else: self.expand(node)
+        self.status = PROVED if self.result else NOT_FOUND
+        return self.result
+
+    def push(self,node) -> None:
+        # Nodes of the same cost are expanded in the order they were created
+        heapq.heappush(self.heap,(node.cost,next(self.counter),node))
+
+    def expand(self,node) -> None:
+        state = node.state
+        fiting_axiom = state.fitAxioms()
+        if fiting_axiom: return self.resolve(node,Proof(state,fiting_axiom))
+        # States resolved elsewhere in the search and states repeating their ancestors are not expanded again
+        key = hash(state)
+        if key in self.proved: return self.resolve(node,self.proved[key])
+        if key in self.failed: return self.resolve(node,None)
+        # A repeated state fails only on this path, neither it nor the states failing because of it are recorded as failed
+        if self.repeated(node): return self.resolve(node,None,cyclic = True)
+        self.nodes += 1
+        for action,result in self.search.alternatives(state,lazy = True):
+            if action.instantiates():
+                alternative = Node(ANY,state,node,0,action,node.depth)
+                alternative.single = True
+                alternative.pending = self.search.instantiations(state,action,result)
+                # Instantiations not created yet count as a single open branch
+                alternative.open = 1
+                # Alternative without any instantiations is left out
+                if self.instantiate(alternative) is None: continue
+                alternative.cost = alternative.children[0].cost
+                node.children.append(alternative)
+                continue
+            if isinstance(result,list) and not len(result): continue
+            results = result if isinstance(result,list) else [result]
+            kind = ANY if not results[0].deterministic else ALL
+            alternative = Node(kind,state,node,0,action,node.depth)
+            alternative.single = not isinstance(result,list)
+            alternative.proofs = [None]*len(results)
+            alternative.open = len(results)
+            for r,res_state in enumerate(results):
+                alternative.children.append(Node(STATE,res_state,alternative,r,depth = node.depth + 1,
+                                                 cost = self.cost(res_state,node.depth + 1,state,action)))
+            # Deterministic branches are as expensive as the most expensive of them, the others as the cheapest one
+            costs = [child.cost for child in alternative.children]
+            alternative.cost = max(costs) if kind == ALL else min(costs)
+            node.children.append(alternative)
+        # Keep only the cheapest alternatives, in their original order
+        if self.beam_width is not None and len(node.children) > self.beam_width:
+            kept = set(map(id,heapq.nsmallest(self.beam_width,node.children,key = lambda alternative: alternative.cost)))
+            node.children = [alternative for alternative in node.children if id(alternative) in kept]
+        for index,alternative in enumerate(node.children): alternative.index = index
+        node.open = len(node.children)
+        # State without any alternatives is not provable
+        if not node.open: return self.resolve(node,None)
+        for alternative in node.children:
+            for child in alternative.children:
+                if andor.resolved(child): break
+                self.schedule(child)
+            if alternative.pending is not None and not alternative.done: self.push(alternative)
+
+    def instantiate(self,alternative):
+        # Create the state of the next instantiation of the alternative, None once there are no more of them
+        result = next(alternative.pending,None)
+        if result is None:
+            alternative.pending = None
+            alternative.open -= 1
+            return None
+        depth = alternative.depth + 1
+        child = Node(STATE,result,alternative,len(alternative.children),depth = depth,
+                     cost = self.cost(result,depth,alternative.state,alternative.action))
+        alternative.children.append(child)
+        alternative.open += 1
+        return child
+
+    def advance(self,alternative) -> None:
+        # Search the next instantiation of the alternative, it waits for the one after it with the same cost
+        child = self.instantiate(alternative)
+        if child is None:
+            # The alternative fails once states of all its instantiations failed
+            if not alternative.open: self.resolve(alternative,None)
+            return
+        alternative.cost = child.cost
+        self.schedule(child)
+        if alternative.pending is not None and not alternative.done: self.push(alternative)
+
+    def schedule(self,child) -> None:
+        # States costing more than max_cost are not searched
+        if self.max_cost is not None and child.cost > self.max_cost:
+            self.cutoffs += 1
+            self.resolve(child,None)
+        else: self.push(child)
+
+    def repeated(self,node) -> bool:
+        # Check whether the state of the node is the same as the state of any of its ancestors
+        key = hash(node.state)
+        ancestor = node.parent
+        while ancestor is not None:
+            if ancestor.kind == STATE and hash(ancestor.state) == key: return True
+            ancestor = ancestor.parent
+        return False
+
+    def resolve(self,node,proof,cyclic = False) -> None:
+        # Propagate the result of the node towards the root
+        andor.resolve(node,proof,self.visit,cyclic)
+
+    def visit(self,node,proof):
+        if node.kind == STATE:
+            if proof: self.proved[hash(node.state)] = proof
+            elif self.exact and not node.cyclic: self.failed.add(hash(node.state))
+            proof = Search.unsimplify(node.state,proof)
+        if node.parent is None: self.result = proof
+        return proof
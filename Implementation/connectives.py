@@ -1,27 +1,61 @@
-import numpy as np
+import itertools, weakref, zlib
+
+# Ids handed out to interned formula nodes
+node_ids = itertools.count()
 
 # Connective
 class Connective:
-    
+
+    # Formula nodes are interned: every distinct structure exists exactly once,
+    # so equality is an identity check and hashes are computed only once
+    __slots__ = ("id","hash","__weakref__")
+
+    interned = weakref.WeakValueDictionary()
+
+    def __init_subclass__(cls) -> None:
+        # Deterministic tag of the connective type used in structural hashes
+        cls.tag = zlib.crc32(cls.__name__.encode())
+
+    @staticmethod
+    def intern(cls,key,fields,child_hashes):
+        # Return the already existing node with the same structure, if there is one
+        node = Connective.interned.get(key)
+        if node is None:
+            # Otherwise create a new node and fill its fields
+            node = object.__new__(cls)
+            for name,value in fields.items(): object.__setattr__(node,name,value)
+            object.__setattr__(node,"id",next(node_ids))
+            object.__setattr__(node,"hash",hash((cls.tag,*child_hashes)))
+            Connective.interned[key] = node
+        return node
+
+    def __setattr__(self,name,value) -> None:
+        raise AttributeError(f"{self.__class__.__name__} formulas are immutable")
+
     def __eq__(self, __value: object) -> bool:
-        return hash(str(self)) == hash(str(__value))
-    
+        return self is __value
+
     def __hash__(self) -> int:
-        if not hasattr(self,'hash'):
-            self.hash = hash(str(np.random.randint(0,15000)) + str(self))
         return self.hash
 
-    
+    def copy(self) -> "Connective":
+        # Formulas are immutable, so they can be shared instead of copied
+        return self
+
+
 # Quantifiers
 class Quantifier(Connective):
 
-    def __init__(self,*args,successor = None) -> None:
-        self.variables = list(args)
-        self.successor = successor
+    __slots__ = ("variables","successor")
+
+    def __new__(cls,*args,successor = None):
+        variables = tuple(args)
+        # Quantifier without any variables is only its successor
+        if not variables: return successor
+        key = (cls,tuple(variable.id for variable in variables),successor.id)
+        child_hashes = [variable.hash for variable in variables] + [successor.hash]
+        return Connective.intern(cls,key,{"variables":variables,"successor":successor},child_hashes)
 
-    def addSuccessor(self,successor) -> None:
-        self.successor = successor
-    
     def __str__(self) -> str:
         # Start with quantifier name
         str_rep = f"{self.__class__.__name__}:"
@@ -31,45 +65,52 @@ class Quantifier(Connective):
         # Finally add formula successing the quantifier
         str_rep += f":{str(self.successor)}"
         return str_rep
-    
-    def copy(self) -> Connective:
-        return Quantifier(*self.variables,successor = self.successor)
-    
+
     def getBoundedLiterals(self) -> list:
-        return self.variables + self.successor.getBoundedLiterals()
+        return list(self.variables) + self.successor.getBoundedLiterals()
+
+    def __reduce__(self):
+        # Rebuild the quantifier through the factory, so that unpickled formulas are interned as well
+        return (build_quantifier,(self.__class__,self.variables,self.successor))
+
+def build_quantifier(quantifier,variables,successor):
+    return quantifier(*variables,successor = successor)
 
 class Existential(Quantifier):
-    pass
+    __slots__ = ()
 
 class Universal(Quantifier):
-    pass
+    __slots__ = ()
 
 # Logical gates
 class Gate(Connective):
 
-    pass
+    __slots__ = ()
 
 class Not(Gate):
 
-    def __init__(self,arg) -> None:
-        self.operand = arg
+    __slots__ = ("operand",)
+
+    def __new__(cls,arg):
+        return Connective.intern(cls,(cls,arg.id),{"operand":arg},[arg.hash])
 
     def __str__(self) -> str:
         return f"-({str(self.operand)})"
-    
-    def copy(self) -> Gate:
-        return BinaryGate(self.operand)
-        
+
     def getBoundedLiterals(self) -> list:
         return [] if isinstance(self.operand,Literal) else self.operand.getBoundedLiterals()
-        
+
+    def __reduce__(self):
+        return (Not,(self.operand,))
+
 class BinaryGate(Gate):
-    
-    def __init__(self,*args) -> None:
-        self.operands = list(args)
 
-    def addSuccessor(self,successor) -> None:
-        self.operands.append(successor)
+    __slots__ = ("operands",)
+
+    def __new__(cls,*args):
+        operands = tuple(args)
+        key = (cls,tuple(operand.id for operand in operands))
+        return Connective.intern(cls,key,{"operands":operands},[operand.hash for operand in operands])
 
     def __str__(self) -> str:
         # Get the gate name
@@ -79,55 +120,138 @@ class BinaryGate(Gate):
             str_rep += f"{str(operand)};"
         # Closee the brackets and return the string
         return str_rep[:-1] + " )"
-    
-    def copy(self) -> Gate:
-        return BinaryGate(*self.operands)
-    
+
     def getBoundedLiterals(self) -> list:
         to_return = []
         for operand in self.operands:
             if not isinstance(operand,Literal):to_return += operand.getBoundedLiterals()
         return to_return
 
+    def __reduce__(self):
+        return (self.__class__,self.operands)
+
 class And(BinaryGate):
-    pass
+    __slots__ = ()
 
 class Or(BinaryGate):
-    pass
+    __slots__ = ()
 
 class Xor(BinaryGate):
-    pass
+    __slots__ = ()
+
+def children(formula) -> tuple:
+    # Direct subformulas of the formula, none for literals
+    if isinstance(formula,Quantifier): return (formula.successor,)
+    if isinstance(formula,Not): return (formula.operand,)
+    if isinstance(formula,BinaryGate): return formula.operands
+    return ()
+
+def postorder(formula,done,descend = None):
+    # Yield the nodes of the formula which are not in done yet, every node after its children, without recursion on deep formulas
+    # The caller has to put every yielded node into done before the next one is requested
+    # Nodes for which descend returns false are yielded without their children
+    stack = [(formula,False)]
+    while stack:
+        node, expanded = stack.pop()
+        if node in done: continue
+        nodes = children(node)
+        if nodes and not expanded and (descend is None or descend(node)):
+            stack.append((node,True))
+            stack += [(child,False) for child in nodes if child not in done]
+            continue
+        yield node
+
+# Symbol table
+class SymbolTable:
+
+    # Names of the literals of a single problem, with dense integer indices
+    # Fresh (skolemn) literals get the next index, so creating them takes constant time
+
+    # Tables by their numbers, so that unpickled literals return to the table they came from
+    registry = weakref.WeakValueDictionary()
+    count = 0
+
+    def __init__(self,number = None) -> None:
+        if number is None: number = SymbolTable.count
+        SymbolTable.count = max(SymbolTable.count,number + 1)
+        self.number = number
+        self.names = []
+        self.indices = {}
+        self.literals = []
+        SymbolTable.registry[number] = self
+
+    def literal(self,name,skolemn = False) -> "Literal":
+        # Return the literal of the given name, create it if there is none yet
+        index = self.indices.get(name)
+        if index is not None: return self.literals[index]
+        index = len(self.names)
+        literal = object.__new__(Literal)
+        object.__setattr__(literal,"value",name)
+        object.__setattr__(literal,"skolemn",skolemn)
+        object.__setattr__(literal,"table",self)
+        object.__setattr__(literal,"index",index)
+        object.__setattr__(literal,"id",next(node_ids))
+        object.__setattr__(literal,"hash",hash((Literal.tag,self.number,index)))
+        self.names.append(name)
+        self.indices[name] = index
+        self.literals.append(literal)
+        return literal
+
+    def fresh(self,skolemn = False) -> "Literal":
+        # Create a new literal, named by its index unless the name is already taken
+        index = len(self.names)
+        while f"_{index}" in self.indices: index += 1
+        return self.literal(f"_{index}",skolemn)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __reduce__(self):
+        return (build_table,(self.number,self.names,[literal.skolemn for literal in self.literals]))
+
+def build_table(number,names,skolemns):
+    # Return the already existing table of the number, extended by the names it does not have yet
+    table = SymbolTable.registry.get(number)
+    if table is None: table = SymbolTable(number)
+    for index in range(len(table),len(names)): table.literal(names[index],skolemns[index])
+    return table
+
+def build_literal(table,index):
+    return table.literals[index]
 
 # Literal
 class Literal():
-    
-    used_tokens = []
 
-    @staticmethod
-    def get_new(skolemn = False):
-        # Get last of used tokens and add 'n' to its end
-        new_token = Literal.used_tokens[-1] + "n"
-        # Add the value among used tokens
-        Literal.used_tokens.append(new_token)
-        # Create a new literal
-        return Literal(new_token,skolemn)
-
-    def __init__(self,token,skolemn = False) -> None:
-        # Remove all useless characters from token string
-        token = token.replace(",","").replace(")","").replace("-","")
-        if "(" in token: token = token[token.index("(")+1:]
-        # Set token value
-        self.value = token
-        # Add token to used tokens
-        if token not in Literal.used_tokens: Literal.used_tokens.append(token)
-        # Set token skolemn identity
-        self.skolemn = skolemn
+    # Literals are created and kept by the symbol table of their problem,
+    # their hash is computed from the number of the table and their index in it
+    __slots__ = ("value","skolemn","table","index","id","hash","__weakref__")
+
+    tag = zlib.crc32(b"Literal")
+
+    def __new__(cls,token,skolemn = False,table = None):
+        # Literals without a given table belong to the default one
+        return (table if table is not None else SymbolTable.default).literal(token,skolemn)
+
+    def __setattr__(self,name,value) -> None:
+        raise AttributeError("Literals are immutable")
 
     def __eq__(self, __value: object) -> bool:
-        return hash(str(self)) == hash(str(__value))
-        
+        return self is __value
+
     def __str__(self) -> str:
         return self.value
 
     def __hash__(self) -> int:
-        return hash(self.value)
+        return self.hash
+
+    def copy(self) -> "Literal":
+        return self
+
+    def getBoundedLiterals(self) -> list:
+        return []
+
+    def __reduce__(self):
+        # The table is pickled only once per pickled object, together with all its literals
+        return (build_literal,(self.table,self.index))
+
+SymbolTable.default = SymbolTable()
@@ -0,0 +1,68 @@
+import weakref
+import numpy as np
+from connectives import *
+
+# Embedding of a state for the RL model: one row of 11 features per node of its formulas, at most 60 rows
+# Columns 0-4: connective (Universal, Existential, And, Or, Xor), 5: literal, 6: nesting depth,
+# and for literals 7: number of negated occurences, 8: number of occurences as a whole formula,
+# 9, 10: distance from the first and to the last occurence, relative to the number of rows
+# Negations do not have rows of their own, they only increase the depth
+
+rows_count = 60
+features_count = 11
+connective_codes = {Universal:0,Existential:1,And:2,Or:3,Xor:4}
+literal_code = 5
+
+# Rows of already embedded formulas: code, depth, id of the literal and whether it is negated
+# Formulas are interned and immutable, so unchanged subformulas are shared between states
+node_rows = weakref.WeakKeyDictionary()
+
+def formula_rows(formula) -> np.ndarray:
+    # Rows of the formula in preorder, without recursion on deep formulas
+    for node in postorder(formula,node_rows):
+        if isinstance(node,Literal):
+            node_rows[node] = np.array([[literal_code,0,node.id,0]],dtype = np.int64)
+            continue
+        parts = []
+        if not isinstance(node,Not): parts.append(np.array([[connective_codes[node.__class__],0,-1,0]],dtype = np.int64))
+        for child in children(node):
+            parts.append(node_rows[child])
+            # Later rows would not fit into the embedding anyway
+            if sum(len(part) for part in parts) >= rows_count: break
+        rows = np.concatenate(parts)[:rows_count].copy()
+        # Rows of the children are one level deeper
+        rows[1 if not isinstance(node,Not) else 0:,1] += 1
+        # Literals directly under a negation are negated
+        if isinstance(node,Not) and isinstance(node.operand,Literal): rows[0,3] = 1
+        node_rows[node] = rows
+    return node_rows[formula]
+
+def embed(state) -> np.ndarray:
+    # Assumptions are ordered by their hashes, so that the embedding does not depend on their order, the goal is last
+    formulas = sorted(state.formulas[:-1],key = lambda formula: formula.hash) + [state.formulas[-1]]
+    parts = []
+    count = 0
+    for formula in formulas:
+        parts.append(formula_rows(formula))
+        count += len(parts[-1])
+        if count >= rows_count: break
+    rows = np.concatenate(parts)[:rows_count]
+    count = len(rows)
+    vectors = np.zeros((rows_count,features_count))
+    vectors[np.arange(count),rows[:,0]] = 1
+    vectors[:count,6] = rows[:,1]
+    # Occurences and positions of the literals
+    positions = np.flatnonzero(rows[:,0] == literal_code)
+    if len(positions):
+        literals, inverse = np.unique(rows[positions,2],return_inverse = True)
+        negated = np.bincount(inverse,weights = rows[positions,3],minlength = len(literals))
+        whole = np.bincount(inverse,weights = rows[positions,1] == 0,minlength = len(literals))
+        first = np.full(len(literals),count)
+        last = np.zeros(len(literals),dtype = np.int64)
+        np.minimum.at(first,inverse,positions)
+        np.maximum.at(last,inverse,positions)
+        vectors[positions,7] = negated[inverse]
+        vectors[positions,8] = whole[inverse]
+        vectors[positions,9] = (positions - first[inverse])/count
+        vectors[positions,10] = (last[inverse] - positions)/count
+    return vectors
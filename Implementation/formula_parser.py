@@ -1,80 +1,106 @@
+import mmap
 from connectives import *
 from rules import State
 
-def parse(file_dir):
-# Open file with formula and read it 
-    file = open(file_dir)
-    line = file.readline()
+# Parser of the QCIR-G14 format: quantifier blocks exists/exist/forall/free, output, gates and/or/xor/ite,
+# quantified gates exists/forall(variables; literal) and comments
+
+def read_lines(file_dir):
+    # Yield lines of the file one by one, from a memory map of it where possible
+    with open(file_dir,"rb") as file:
+        try:
+            memory = mmap.mmap(file.fileno(),0,access = mmap.ACCESS_READ)
+        # Empty files and streams can not be mapped, read them as they are
+        except (ValueError,OSError):
+            memory = None
+        if memory is None:
+            for line in file: yield line.decode()
+            return
+        with memory:
+            for line in iter(memory.readline,b""): yield line.decode()
 
+def parse(file_dir):
+    lines = read_lines(file_dir)
     # Check the format
-    if line[:5] != "#QCIR": raise ValueError("Given file seems not to containt formula in QCIR format")
-    line = file.readline()
+    if not next(lines,"").startswith("#QCIR"): raise ValueError("Given file seems not to containt formula in QCIR format")
 
-    # Start looping through the lines of the file
-    mode = "prenex"
-    formula = And() # Initialize the formula
-    bottom_formula = formula # Create a variable pointing to the formula which should be expanded
-    formula_dict = {}
-    while line != "":
-        tokens = line.split()
-        # Parse quantifiers in the following way:
-        # 1. get list of their literals
-        # 2. create new formula
-        # 3. set this formula as a successor of the current bottom formula
-        # 4. redirect bottom formula to this new formula
-        if mode == "prenex":
-            if "exists" in tokens[0]:
-                new_formula = Existential(*[Literal(token) for token in tokens])
-                bottom_formula.addSuccessor(new_formula)
-                bottom_formula = new_formula
-            elif "forall" in tokens[0]:
-                new_formula = Universal(*[Literal(token) for token in tokens])
-                bottom_formula.addSuccessor(new_formula)
-                bottom_formula = new_formula
-            # Once the output line is reached, switch to post-prenex mode and store identifier of the topmost formula
-            elif "output" in tokens[0]:
-                stop_literal = Literal(tokens[0])
-                mode = "post-prenex"
-        else:
-            variable = Literal(tokens[0])
-            gate = tokens[2]
-            successors = []
-            # Parse connective operands
-            for token in tokens[2:]:
-                if "()" in token:continue
-                # If the operand variable is a placeholder for another formula, use that formula
-                if Literal(token) in formula_dict.keys():
-                    new_successor = formula_dict[Literal(token)]
-                    Literal.used_tokens.remove(Literal(token).value)
-                # Otherwise use just the variable name
-                else:
-                    new_successor = Literal(token)
-                # If the operand is negated, put the created literal object into a negation
-                if "-" in token:
-                    new_successor = Not(new_successor)
-                successors.append(new_successor)
-            # Check connectives and create the appropriate one
-            if "exists" in tokens[0]:
-                new_formula = Existential(*successors[:-1],successor=successors[-1])
-            elif "forall" in tokens[0]:
-                new_formula = Universal(*successors[:-1],successor=successors[-1])
-            elif "and" in gate:
-                new_formula = And(*successors)
-            elif "xor" in gate:
-                new_formula = Xor(*successors)
-            elif "or" in gate:
-                new_formula = Or(*successors)
-            # If the variable matches the output one, create a proof tree with recently created formula as its root
-            if variable == stop_literal:
-                bottom_formula.addSuccessor(new_formula)
-                Literal.used_tokens.remove(stop_literal.value)
-                return State(Not(formula.operands[0]),Or())
-            # Otherwise save the variable as a placeholder for its formula
-            else:
-                formula_dict[variable] = new_formula
-        line = file.readline()
-    else:
-        raise ValueError("Output variable was not introduced")
+    prefix = [] # Quantifier blocks of the prenex, from the outermost one
+    output = None
+    # Formulas of the gates and literals of the variables by their ids,
+    # numeric ids are kept as integers
+    gates = {}
+    literals = {}
+    # Every problem has its own literals
+    table = SymbolTable()
 
+    def identifier(name):
+        return int(name) if name.isdigit() else name
+
+    def variable(name):
+        key = identifier(name)
+        literal = literals.get(key)
+        if literal is None: literal = literals[key] = table.literal(name)
+        return literal
+
+    def operand(token):
+        # Formula of a gate or a variable, negated if the token starts with minus
+        negated = token.startswith("-")
+        name = token[1:].strip() if negated else token
+        formula = gates.get(identifier(name))
+        if formula is None: formula = variable(name)
+        return Not(formula) if negated else formula
+
+    for number,line in enumerate(lines,2):
+        line = line.strip()
+        # Skip empty lines and comments
+        if not line or line.startswith("#"): continue
+        head, bracket, arguments = line.partition("(")
+        if not bracket or not arguments.endswith(")"): raise ValueError(f"Line {number} is not a valid QCIR statement: {line}")
+        arguments = arguments[:-1]
+        name, equals, keyword = head.partition("=")
+        keyword = keyword.strip().lower() if equals else name.strip().lower()
+        # Quantifier blocks and output of the prenex
+        if not equals:
+            tokens = [token.strip() for token in arguments.split(",") if token.strip()]
+            # Blocks without variables quantify nothing, they are left out
+            if keyword in ("exists","exist"):
+                if tokens: prefix.append((Existential,[variable(token) for token in tokens]))
+            elif keyword == "forall":
+                if tokens: prefix.append((Universal,[variable(token) for token in tokens]))
+            # Free variables stay free
+            elif keyword == "free":
+                for token in tokens: variable(token)
+            elif keyword == "output":
+                if len(tokens) != 1: raise ValueError(f"Line {number}: output has to be a single literal")
+                output = tokens[0]
+            else: raise ValueError(f"Line {number}: unknown statement {keyword}")
+            continue
+        # Gates
+        name = name.strip()
+        if keyword in ("exists","exist","forall"):
+            # Quantified gate: variables; literal
+            variables, semicolon, successor = arguments.partition(";")
+            if not semicolon: raise ValueError(f"Line {number}: quantified gate needs variables and a literal separated by ';'")
+            quantifier = Existential if keyword != "forall" else Universal
+            variables = [variable(token.strip()) for token in variables.split(",") if token.strip()]
+            if not variables: raise ValueError(f"Line {number}: quantified gate needs at least one variable")
+            formula = quantifier(*variables,successor = operand(successor.strip()))
+        else:
+            operands = [operand(token.strip()) for token in arguments.split(",") if token.strip()]
+            if keyword == "and": formula = And(*operands)
+            elif keyword == "or": formula = Or(*operands)
+            elif keyword == "xor": formula = Xor(*operands)
+            elif keyword == "ite":
+                if len(operands) != 3: raise ValueError(f"Line {number}: ite needs three operands")
+                condition, then, otherwise = operands
+                formula = Or(And(condition,then),And(Not(condition),otherwise))
+            else: raise ValueError(f"Line {number}: unknown gate {keyword}")
+        gates[identifier(name)] = formula
 
-    
+    if output is None: raise ValueError("Output variable was not introduced")
+    formula = operand(output)
+    # Put the formula under the quantifiers of the prenex, starting from the innermost one
+    for quantifier,variables in reversed(prefix):
+        formula = quantifier(*variables,successor = formula)
+    # The proof starts from the parsed sequent, followed by its simplification
+    return State(Not(formula),Or()).simplifyFormulas()
@@ -0,0 +1,138 @@
+import sys, time
+from collections import defaultdict
+from axioms import Axiom
+from rules import Action
+
+class RuleStats:
+
+    __slots__ = ("checked","applicable","sequents","applied","branches","outcomes","proved","applicable_time","apply_time")
+
+    def __init__(self) -> None:
+        # Number of states the rule was checked on and of those it was applicable to
+        self.checked = 0
+        self.applicable = 0
+        # Number of sequents the rule was applicable to, of applications and of resulting states
+        self.sequents = 0
+        self.applied = 0
+        self.branches = 0
+        # Number of finished applications and of those which led to a proof
+        self.outcomes = 0
+        self.proved = 0
+        # Cumulative time spent in applicable and apply
+        self.applicable_time = 0.0
+        self.apply_time = 0.0
+
+    def summary(self) -> dict:
+        return {"checked":self.checked,"applicable":self.applicable,"sequents":self.sequents,"applied":self.applied,
+                "branching_factor":self.branches/self.applied if self.applied else 0.0,
+                "success_rate":self.proved/self.outcomes if self.outcomes else 0.0,
+                "applicable_time":self.applicable_time,"apply_time":self.apply_time}
+
+class TimedAction:
+
+    # Stands in for an action class during an instrumented search, timing its apply
+    def __init__(self,action,instrumentation) -> None:
+        self.action = action
+        self.__name__ = action.__name__
+        self.stats = instrumentation.rules[action.__name__]
+        self.instrumentation = instrumentation
+
+    def apply(self,state,*args):
+        start = time.perf_counter()
+        result = self.action.apply(state,*args)
+        elapsed = time.perf_counter() - start
+        self.stats.applied += 1
+        self.stats.apply_time += elapsed
+        self.stats.branches += len(result) if isinstance(result,list) else 1
+        self.instrumentation.emit("apply",action = self.action,state = state,result = result,time = elapsed)
+        return result
+
+    def instantiates(self):
+        return self.action.instantiates()
+
+    def getAssignments(self,state,formula):
+        return self.action.getAssignments(state,formula)
+
+# Statistics of rules, axioms and depths of a search
+# Attaching it to a search replaces some of the search's methods by recording ones,
+# searches without instrumentation run unchanged code
+class Instrumentation:
+
+    def __init__(self) -> None:
+        self.rules = defaultdict(RuleStats)
+        self.axioms = defaultdict(int)
+        self.depths = defaultdict(int)
+        self.listeners = []
+
+    def subscribe(self,listener) -> None:
+        # Listener is called as listener(event, **data) for events
+        # expand, applicable, apply, outcome and axiom
+        self.listeners.append(listener)
+
+    def emit(self,event,**data) -> None:
+        for listener in self.listeners: listener(event,**data)
+
+    def attach(self,search) -> None:
+        expand, order_actions, feedback = search.expand, search.orderActions, search.feedback
+        instrumentation = self
+
+        def recorded_expand(state,depth):
+            instrumentation.depths[depth] += 1
+            instrumentation.emit("expand",state = state,depth = depth)
+            proof = yield from expand(state,depth)
+            # Proof without any children consists only of an axiom
+            if proof and not proof.children: instrumentation.recordAxiom(state,proof.rule)
+            return proof
+
+        def timed_possible_actions(state):
+            # Same as State.possibleActions, timing applicable of each action
+            possible_actions = []
+            for action in Action.__subclasses__():
+                start = time.perf_counter()
+                sequents = action.applicable(state)
+                elapsed = time.perf_counter() - start
+                stats = instrumentation.rules[action.__name__]
+                stats.checked += 1
+                stats.applicable_time += elapsed
+                if sequents:
+                    stats.applicable += 1
+                    stats.sequents += len(sequents)
+                    possible_actions.append((action,sequents))
+                instrumentation.emit("applicable",action = action,state = state,sequents = sequents,time = elapsed)
+            return possible_actions
+
+        def timed_order_actions(state):
+            return [(TimedAction(action,instrumentation),sequents) for action,sequents in order_actions(state)]
+
+        def recorded_feedback(state,action,proof):
+            action.stats.outcomes += 1
+            if proof: action.stats.proved += 1
+            instrumentation.emit("outcome",action = action.action,state = state,proof = proof)
+            feedback(state,action.action,proof)
+
+        search.expand = recorded_expand
+        search.possibleActions = timed_possible_actions
+        search.orderActions = timed_order_actions
+        search.feedback = recorded_feedback
+
+    def recordAxiom(self,state,check_result) -> None:
+        # Find which of the axioms gave the result
+        for axiom in Axiom.__subclasses__():
+            if axiom.check(state) == check_result:
+                self.axioms[axiom.__name__] += 1
+                self.emit("axiom",axiom = axiom,state = state)
+                return
+
+    def summary(self) -> dict:
+        return {"rules":{name:stats.summary() for name,stats in self.rules.items()},
+                "axioms":dict(self.axioms),
+                "depths":dict(sorted(self.depths.items()))}
+
+    def dump(self,stream = sys.stdout) -> None:
+        stream.write(f"{'rule':<24}{'checked':>9}{'applicable':>11}{'applied':>9}{'branching':>10}{'success':>9}{'applicable s':>14}{'apply s':>10}\n")
+        for name,stats in sorted(self.rules.items(),key = lambda item: -item[1].apply_time - item[1].applicable_time):
+            summary = stats.summary()
+            stream.write(f"{name:<24}{stats.checked:>9}{stats.applicable:>11}{stats.applied:>9}{summary['branching_factor']:>10.2f}"
+                         f"{summary['success_rate']:>9.2f}{stats.applicable_time:>14.4f}{stats.apply_time:>10.4f}\n")
+        stream.write("Axioms: " + ", ".join(f"{name} {count}" for name,count in self.axioms.items()) + "\n")
+        stream.write("Depths: " + ", ".join(f"{depth}:{count}" for depth,count in sorted(self.depths.items())) + "\n")
@@ -0,0 +1,199 @@
+import torch
+import numpy as np
+from collections import OrderedDict
+from typing import Optional
+from rules import *
+from search import Search
+
+# Actions the RL model predicts qualities of, in the order of its outputs
+action_list = [NegateGoal, NegateSequent, DeMorganAnd, DeMorganOr, DeMorganExistential,
+               DeMorganUniversal, ExistentialReplacement, UniversalReplacement,
+                AndAssumption, OrAssumption, XorAssumption, UniversalAssumption,
+                ExistentialAssumption, AndGoal, OrGoal, XorGoal, UniversalGoal, ExistentialGoal]
+
+# Embeddings and predicted qualities of recently evaluated states by their keys, the least recently used are evicted
+# Embeddings do not depend on the model, qualities are valid only for the version of the model which predicted them
+# Embeddings are kept in float32 as the model takes them, an entry takes about 3 kB
+class QualityCache:
+
+    def __init__(self,max_entries = 2**14) -> None:
+        # Entries [embedding, version, qualities of all actions] by keys of the states
+        self.entries = OrderedDict()
+        self.max_entries = max_entries
+        # Number of lookups with up to date qualities, with only the embedding usable and of the missing ones
+        self.hits = 0
+        self.embedding_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookup(self,state,version) -> list:
+        # Entry of the state, created if missing, its qualities are None unless predicted by the given version
+        key = state.key
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            entry = self.entries[key] = [state.embedde().astype(np.float32),None,None]
+            if len(self.entries) > self.max_entries:
+                self.entries.popitem(last = False)
+                self.evictions += 1
+            return entry
+        self.entries.move_to_end(key)
+        # Entries still waiting for their qualities get them together with the first lookup
+        if entry[1] == version or entry[2] is None:
+            self.hits += 1
+        else:
+            self.embedding_hits += 1
+            entry[1] = entry[2] = None
+        return entry
+
+    def embedding(self,state):
+        # Embedding of the state, from the cache if it is there, without counting it as a lookup
+        entry = self.entries.get(state.key)
+        return entry[0] if entry is not None else state.embedde().astype(np.float32)
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.embedding_hits + self.misses
+        return {"hits":self.hits,"embedding_hits":self.embedding_hits,"misses":self.misses,"evictions":self.evictions,
+                "entries":len(self.entries),"hit_rate":self.hits/lookups if lookups else 0.0}
+
+# State encoder and action head of the model
+# It keeps no Python objects, so that it can be compiled by TorchScript
+class Network(torch.nn.Module):
+
+    def __init__(self, actions_count: int) -> None:
+        super().__init__()
+        # State encoder
+        self.lstm1 = torch.nn.LSTM(11, 70, batch_first = True)
+        self.ac1 = torch.nn.ReLU()
+        # Action head
+        self.fcn2 = torch.nn.Linear(70, actions_count)
+
+    def encode(self, x: torch.Tensor, lengths: Optional[torch.Tensor] = None) -> torch.Tensor:
+        # Encode a batch of embeddings (batch, rows, 11), lengths are the numbers of their rows without padding
+        if lengths is not None:
+            packed = torch.nn.utils.rnn.pack_padded_sequence(x, lengths.clamp(min = 1).cpu(), batch_first = True, enforce_sorted = False)
+            encoded = self.lstm1(packed)[1][0][-1]
+        else:
+            encoded = self.lstm1(x)[1][0][-1]
+        return self.ac1(encoded)
+
+    def forward(self, x: torch.Tensor, lengths: Optional[torch.Tensor] = None) -> torch.Tensor:
+        return self.fcn2(self.encode(x, lengths))
+
+# Model predicting qualities of actions applied to a state
+# The encoder runs an LSTM over the rows of the state's embedding, the head then gives qualities of all actions at once
+class RLModel(torch.nn.Module):
+
+    # Format of the saved checkpoints
+    checkpoint_format = 1
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.action_list = action_list
+        self.action_indices = {action:a for a,action in enumerate(action_list)}
+        self.network = Network(len(action_list))
+        # Version of the weights, increased by every step of a watched optimizer
+        self.version = 0
+        self.cache = QualityCache()
+
+    def encode(self, x: torch.Tensor, lengths: torch.Tensor = None) -> torch.Tensor:
+        return self.network.encode(x, lengths)
+
+    def forward(self, x: torch.Tensor, lengths: torch.Tensor = None) -> torch.Tensor:
+        # Qualities of all actions for a batch of embeddings, or for a single one
+        single = x.dim() == 2
+        if single:
+            x = x.unsqueeze(0)
+            if lengths is not None: lengths = lengths.reshape(1)
+        qualities = self.network(x, lengths)
+        return qualities[0] if single else qualities
+
+    def script(self) -> None:
+        # Compile the network by TorchScript, its weights stay the same
+        self.network = torch.jit.script(self.network)
+
+    def save(self, path) -> None:
+        # Save the weights together with the actions they predict qualities of
+        torch.save({"format":RLModel.checkpoint_format,"actions":[action.__name__ for action in self.action_list],
+                    "version":self.version,"weights":self.state_dict()}, path)
+
+    @staticmethod
+    def load(path) -> "RLModel":
+        # Load a model saved by save, its actions have to match the current ones
+        checkpoint = torch.load(path)
+        if not isinstance(checkpoint,dict) or checkpoint.get("format") != RLModel.checkpoint_format:
+            raise ValueError(f"File {path} is not a checkpoint of the RL model in format {RLModel.checkpoint_format}")
+        model = RLModel()
+        actions = [action.__name__ for action in model.action_list]
+        if checkpoint["actions"] != actions:
+            raise ValueError(f"Checkpoint {path} predicts qualities of actions {checkpoint['actions']}, the model of {actions}")
+        model.load_state_dict(checkpoint["weights"])
+        model.version = checkpoint["version"]
+        return model
+
+    @staticmethod
+    def batch(embeddings) -> tuple:
+        # Stack embeddings of states into a batch together with numbers of their rows
+        # Rows without any node are padding, they are all at the end of the embedding
+        x = torch.from_numpy(np.stack(embeddings)).to(torch.float32)
+        lengths = x[:,:,:6].any(dim = 2).sum(dim = 1)
+        return x, lengths
+
+    def updated(self) -> None:
+        # Qualities predicted before the weights changed are out of date
+        self.version += 1
+
+    def watch(self, optimizer) -> None:
+        # Update the version after every step of the optimizer
+        optimizer.register_step_post_hook(lambda optimizer, args, kwargs: self.updated())
+
+    def qualities(self, states, possible_actions = None) -> list:
+        # Predicted qualities of the actions applicable to each of the states
+        # States without up to date qualities in the cache are evaluated by a single pass of the model
+        # possible_actions are pairs of actions and sequents for each state, looked up if not given
+        if possible_actions is None: possible_actions = [state.possibleActions() for state in states]
+        entries = [self.cache.lookup(state, self.version) for state in states]
+        missing = list({id(entry):entry for entry in entries if entry[2] is None}.values())
+        if missing:
+            x, lengths = RLModel.batch([entry[0] for entry in missing])
+            with torch.no_grad():
+                predicted = self(x, lengths = lengths).tolist()
+            for entry,qualities in zip(missing,predicted): entry[1], entry[2] = self.version, qualities
+        # Only the applicable actions get qualities, those the model does not know get the lowest one
+        return [{action:entries[s][2][self.action_indices[action]] if action in self.action_indices else float("-inf") for action,sequents in pairs}
+                for s,pairs in enumerate(possible_actions)]
+
+# Search ordering the actions by the qualities predicted by the model, State.model unless another one is given
+class GuidedSearch(Search):
+
+    def __init__(self,transposition_table,model = None,**kwargs) -> None:
+        super().__init__(transposition_table,**kwargs)
+        self.model = model if model is not None else State.model
+
+    def possibleActions(self,state) -> list:
+        # Applicable actions looked up when the state was evaluated together with its siblings are used only once
+        possible_actions = getattr(state,"possible_actions",None)
+        if possible_actions is None: return state.possibleActions()
+        state.possible_actions = None
+        return possible_actions
+
+    def orderActions(self,state) -> list:
+        # Get all applicable actions and order them by the quality predicted by the RL model
+        possible_actions = self.possibleActions(state)
+        # States resulting from a single action are evaluated together, others on their own
+        if getattr(state,"qualities",None) is None: state.qualities = self.model.qualities([state],[possible_actions])[0]
+        possible_actions.sort(key = lambda pair: state.qualities[pair[0]], reverse = True)
+        return Search.heuristics(state,possible_actions)
+
+    def alternatives(self,state,lazy = False):
+        for action,result in Search.alternatives(self,state,lazy):
+            # Evaluate all states resulting from the action by a single batched pass of the model
+            # Their applicable actions are kept for ordering them later
+            if isinstance(result,list) and result:
+                possible_actions = [res_state.possibleActions() for res_state in result]
+                for res_state,pairs,qualities in zip(result,possible_actions,self.model.qualities(result,possible_actions)):
+                    res_state.possible_actions, res_state.qualities = pairs, qualities
+            yield action,result
@@ -0,0 +1,143 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from search import Search, CANCELLED
+from transposition import TranspositionTable
+from proof import Proof
+import andor
+from andor import STATE, ALL, ANY
+
+# Worker process state: flags of cancelled tasks and a transposition table kept between tasks
+cancelled = None
+worker_table = None
+
+def init_worker(flags,max_bytes) -> None:
+    global cancelled, worker_table
+    cancelled = flags
+    worker_table = TranspositionTable(max_bytes = max_bytes)
+
+def search_task(task,state):
+    # Search the state in a worker process, stop once the task gets cancelled
+    return Search(worker_table).run(state,cancelled = lambda: cancelled[task])
+
+def instantiation_task(task,state,action,sequent):
+    # Search the instantiations of the sequent one after another, as the sequential search does,
+    # and return the proof of the first proved one
+    search = Search(worker_table)
+    for result in search.instantiations(state,action,sequent):
+        proof = search.run(result,cancelled = lambda: cancelled[task])
+        if proof or search.status == CANCELLED: return proof
+    return None
+
+# Node of the AND/OR tree expanded by the main process
+class Node(andor.Node):
+
+    __slots__ = ("task","future","sequent")
+
+    def __init__(self,kind,state,parent,index,action = None) -> None:
+        super().__init__(kind,state,parent,index,action)
+        # Leaves searched by the workers have their task number and future
+        self.task = None
+        self.future = None
+        # Leaf searching the instantiations of the sequent of its parent's state, created lazily by the worker
+        self.sequent = None
+
+# AND/OR-parallel search: the main process expands the states up to split_depth,
+# states at that depth are searched by worker processes.
+# Deterministic branches are searched concurrently and cancelled once any of them fails,
+# alternatives and indeterministic branches race and the first proof wins.
+# Instantiations of a sequent are left to a single worker, which creates and searches them one after another.
+class ParallelSearch:
+
+    def __init__(self,workers = None,split_depth = 2,worker_bytes = 2**28) -> None:
+        self.workers = workers
+        self.split_depth = split_depth
+        # Memory budget of the transposition table of each worker
+        self.worker_bytes = worker_bytes
+        # The main process expands states in the same order as the sequential search
+        self.search = Search(TranspositionTable())
+        self.result = None
+
+    def run(self,root):
+        self.result = None
+        self.leaves = []
+        ready = []
+        root_node = self.build(root,None,0,0,ready)
+        # Propagate results known already after the expansion
+        for node,proof in ready: self.resolve(node,proof)
+        if root_node.done: return Search.unsimplify(root,self.result)
+        # Search the remaining leaves in the worker processes
+        flags = multiprocessing.Array("b",len(self.leaves),lock = False)
+        self.flags = flags
+        with ProcessPoolExecutor(self.workers,initializer = init_worker,initargs = (flags,self.worker_bytes)) as pool:
+            futures = {}
+            for leaf in self.leaves:
+                if not andor.resolved(leaf):
+                    if leaf.sequent is None: leaf.future = pool.submit(search_task,leaf.task,leaf.state)
+                    else: leaf.future = pool.submit(instantiation_task,leaf.task,leaf.state,leaf.action,leaf.sequent)
+                    futures[leaf.future] = leaf
+            while futures and not root_node.done:
+                finished, _ = wait(futures,return_when = FIRST_COMPLETED)
+                for future in finished:
+                    leaf = futures.pop(future)
+                    if not future.cancelled(): self.resolve(leaf,future.result())
+            # Stop the workers still searching
+            self.cancel(root_node)
+        return Search.unsimplify(root,self.result)
+
+    def build(self,state,parent,index,depth,ready):
+        node = Node(STATE,state,parent,index)
+        # States at split_depth are left for the workers
+        if depth >= self.split_depth:
+            node.task = len(self.leaves)
+            self.leaves.append(node)
+            return node
+        fiting_axiom = state.fitAxioms()
+        if fiting_axiom:
+            ready.append((node,Proof(state,fiting_axiom)))
+            return node
+        for action,result in self.search.alternatives(state,lazy = True):
+            if action.instantiates():
+                # Proof of an instantiation proves the indeterministic result
+                alternative = Node(ANY,state,node,len(node.children),action)
+                alternative.single = True
+                alternative.open = 1
+                leaf = Node(STATE,state,alternative,0,action)
+                leaf.sequent = result
+                leaf.task = len(self.leaves)
+                self.leaves.append(leaf)
+                alternative.children.append(leaf)
+                node.children.append(alternative)
+                continue
+            if isinstance(result,list) and not len(result): continue
+            results = result if isinstance(result,list) else [result]
+            kind = ANY if not results[0].deterministic else ALL
+            alternative = Node(kind,state,node,len(node.children),action)
+            alternative.single = not isinstance(result,list)
+            alternative.proofs = [None]*len(results)
+            alternative.open = len(results)
+            for r,res_state in enumerate(results):
+                alternative.children.append(self.build(res_state,alternative,r,depth + 1,ready))
+            node.children.append(alternative)
+        node.open = len(node.children)
+        # State without any alternatives is not provable
+        if not node.open: ready.append((node,None))
+        return node
+
+    def resolve(self,node,proof) -> None:
+        # Propagate the result of the node towards the root, cancelling the tasks below every resolved node
+        andor.resolve(node,proof,self.visit)
+
+    def visit(self,node,proof):
+        self.cancel(node)
+        if node.parent is None: self.result = proof
+        return proof
+
+    def cancel(self,node) -> None:
+        # Cancel all tasks searching leaves below the node
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            stack += node.children
+            if node.future is not None:
+                node.future.cancel()
+                self.flags[node.task] = 1
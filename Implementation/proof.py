@@ -0,0 +1,63 @@
+import io, weakref
+from rules import State
+
+class Proof:
+
+    # Step of a proof: a sequent, the rule applied to it and proofs of the resulting sequents
+    # Steps are shared, so a subproof reached from several places exists only once
+    # Only formulas and the key of the state are kept, not the indices the search built on it
+    __slots__ = ("formulas","key","rule","children","branching","lines","__weakref__")
+
+    interned = weakref.WeakValueDictionary()
+
+    def __new__(cls,state,rule,*children,branching = False):
+        key = (state.key,rule,branching,tuple(id(child) for child in children))
+        proof = Proof.interned.get(key)
+        if proof is None:
+            proof = object.__new__(cls)
+            proof.formulas = tuple(state.formulas)
+            proof.key = state.key
+            # Name of the applied action, or of the axiom if there are no children
+            proof.rule = rule
+            proof.children = children
+            # Whether all children have to be proved, they are then written as separate branches
+            proof.branching = branching
+            # Number of lines of the written proof
+            proof.lines = 2 + sum(child.lines for child in children) + (len(children) if branching else 0)
+            Proof.interned[key] = proof
+        return proof
+
+    def __reduce__(self):
+        # Rebuild the step through the constructor, so that unpickled proofs are shared as well
+        return (build_proof,(self.formulas,self.rule,self.children,self.branching))
+
+    def write(self,stream) -> None:
+        # Write the proof into the given text stream, line by line
+        stack = [(self,"")]
+        while stack:
+            step, indent = stack.pop()
+            # Branch headers are stored on the stack as plain strings
+            if isinstance(step,str):
+                stream.write(f"{indent}{step}\n")
+                continue
+            stream.write(f"{indent}{State.sequent(step.formulas)}\n")
+            # Axioms close the proof
+            if not step.children:
+                stream.write(f"{indent}{step.rule}\n")
+                continue
+            stream.write(f"{indent}{step.rule}:\n")
+            if step.branching:
+                # Add branches in reverse, so that they are written in their order
+                for b in reversed(range(len(step.children))):
+                    stack.append((step.children[b],indent + "  "))
+                    stack.append((f"Branch {b}:",indent))
+            else:
+                stack.append((step.children[0],indent))
+
+    def __str__(self) -> str:
+        stream = io.StringIO()
+        self.write(stream)
+        return stream.getvalue()[:-1]
+
+def build_proof(formulas,rule,children,branching):
+    return Proof(State(*formulas),rule,*children,branching = branching)
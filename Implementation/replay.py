@@ -0,0 +1,82 @@
+import torch
+import numpy as np
+from embedding import rows_count, features_count
+from model import RLModel
+
+# Fixed capacity buffer of transitions (embedding of a state, index of the applied action, target quality)
+# Transitions are kept in preallocated arrays, once the buffer is full the oldest ones are overwritten
+class ReplayBuffer:
+
+    def __init__(self,capacity = 2**16,seed = None) -> None:
+        self.capacity = capacity
+        self.embeddings = np.zeros((capacity,rows_count,features_count),dtype = np.float32)
+        self.actions = np.zeros(capacity,dtype = np.int64)
+        self.targets = np.zeros(capacity,dtype = np.float32)
+        # Position the next transition is written to and number of stored transitions
+        self.position = 0
+        self.size = 0
+        # Random generator shuffling the minibatches, seeded for reproducible training
+        self.random = np.random.default_rng(seed)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def push(self,embedding,action,target) -> None:
+        self.embeddings[self.position] = embedding
+        self.actions[self.position] = action
+        self.targets[self.position] = target
+        self.position = (self.position + 1) % self.capacity
+        self.size = min(self.size + 1,self.capacity)
+
+    def extend(self,embeddings,actions,targets) -> None:
+        # Push arrays of transitions at once, only the last capacity of them fit
+        count = min(len(actions),self.capacity)
+        indices = (self.position + np.arange(count)) % self.capacity
+        self.embeddings[indices] = embeddings[len(actions) - count:]
+        self.actions[indices] = actions[len(actions) - count:]
+        self.targets[indices] = targets[len(actions) - count:]
+        self.position = (self.position + count) % self.capacity
+        self.size = min(self.size + count,self.capacity)
+
+    def transitions(self) -> tuple:
+        # Arrays of the stored transitions, from the oldest one
+        indices = (self.position - self.size + np.arange(self.size)) % self.capacity
+        return self.embeddings[indices], self.actions[indices], self.targets[indices]
+
+    def save(self,path) -> None:
+        # Write the stored transitions into a compressed .npz shard
+        embeddings, actions, targets = self.transitions()
+        np.savez_compressed(path,embeddings = embeddings,actions = actions,targets = targets)
+
+    def load(self,path) -> int:
+        # Push transitions of a shard, return their number
+        with np.load(path) as shard:
+            self.extend(shard["embeddings"],shard["actions"],shard["targets"])
+            return len(shard["actions"])
+
+    def clear(self) -> None:
+        self.position = 0
+        self.size = 0
+
+    def minibatches(self,batch_size,count = 1):
+        # Yield up to count minibatches (embeddings, actions, targets) of distinct transitions in random order
+        order = self.random.permutation(self.size)
+        for start in range(0,min(count*batch_size,self.size),batch_size):
+            indices = order[start:start + batch_size]
+            yield self.embeddings[indices], self.actions[indices], self.targets[indices]
+
+# Train the model on minibatches from the replay buffer, one batched forward and backward pass each
+# Return the mean loss
+def train(model,optimizer,replay_buffer,batch_size = 64,batches = 1) -> float:
+    criterion = torch.nn.SmoothL1Loss()
+    losses = []
+    for embeddings,actions,targets in replay_buffer.minibatches(batch_size,batches):
+        x, lengths = RLModel.batch(embeddings)
+        # Qualities of the applied actions only
+        predicted = model(x, lengths = lengths).gather(1,torch.from_numpy(actions)[:,None]).squeeze(1)
+        loss = criterion(predicted,torch.from_numpy(targets))
+        optimizer.zero_grad()
+        loss.backward()
+        optimizer.step()
+        losses.append(loss.item())
+    return sum(losses)/len(losses) if losses else 0.0
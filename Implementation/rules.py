@@ -1,7 +1,9 @@
-import itertools
-import numpy as np
+import bisect, itertools
 from connectives import *
 from axioms import Axiom
+from terms import TermProvider, free_occurrences
+from simplifier import fold, simplify
+from embedding import embed
 import torch
 
 class State():
@@ -18,34 +20,159 @@ class State():
     def optimizer(self):
         return State.optimizer
 
-    @staticmethod
-    def embedde_token(keyword):
-        building_blocks = ["Forall","Exist","And","Or","Xor"]
-        main_vect = np.zeros(7)
-        try:
-            search_key = keyword.replace("(","").replace(")","").replace("-","")
-            main_vect[building_blocks.index(search_key)] = 1
-        except ValueError:
-            main_vect[-2] = 1
-        main_vect[-1] = keyword.count("-")
-        return main_vect
-    
+    # Assumption hashes are summed modulo 2^64
+    hash_mask = (1 << 64) - 1
+
     def __init__(self,*args,deterministic=True) -> None:
         self.formulas = list(args)
         self.successors = []
         self.deterministic = deterministic
+        # Order independent hash of the assumption multiset
+        # It is computed only here, the methods changing formulas then update it incrementally
+        self.assumption_hash = sum(formula.hash for formula in self.formulas[:-1]) & State.hash_mask
+        # Positions of the assumptions by their shape, built once the actions are first looked for
+        self.index = None
+        # Multiset of the assumptions, operands of the negated ones and number of complementary pairs,
+        # built once the axioms are first checked
+        self.counts = None
+        # The state as it was before its formulas were simplified, if they were
+        self.original = None
+
+    def copy(self,deterministic=True):
+        # Create a new state with the same formulas, reusing the hash of the assumptions and the index
+        new_state = State.__new__(State)
+        new_state.formulas = self.formulas.copy()
+        new_state.successors = []
+        new_state.deterministic = deterministic
+        new_state.assumption_hash = self.assumption_hash
+        new_state.index = None if self.index is None else {shape:positions.copy() for shape,positions in self.index.items()}
+        new_state.counts = None if self.counts is None else self.counts.copy()
+        new_state.original = None
+        if self.counts is not None:
+            new_state.negated = self.negated.copy()
+            new_state.conflicts = self.conflicts
+        return new_state
+
+    @staticmethod
+    def shape(formula) -> type:
+        # Connective of the formula, negations are told apart by the connective they negate
+        return (Not,formula.operand.__class__) if formula.__class__ is Not else formula.__class__
+
+    def buildIndex(self) -> None:
+        self.index = {}
+        for f,formula in enumerate(self.formulas[:-1]):
+            self.index.setdefault(State.shape(formula),[]).append(f)
+
+    def positions(self,shape,goal=True) -> list:
+        # Ascending positions of the formulas of the given shape, including the goal unless goal is false
+        if self.index is None: self.buildIndex()
+        positions = self.index.get(shape)
+        positions = positions.copy() if positions else []
+        if goal and State.shape(self.formulas[-1]) == shape: positions.append(len(self.formulas) - 1)
+        return positions
+
+    def buildCounts(self) -> None:
+        self.counts = {}
+        self.negated = set()
+        self.conflicts = 0
+        for formula in self.formulas[:-1]: self.countFormula(formula)
+
+    def countFormula(self,formula) -> None:
+        # Add the assumption to the multiset, a newly present formula may complete complementary pairs
+        count = self.counts.get(formula,0)
+        self.counts[formula] = count + 1
+        if count: return
+        if formula in self.negated: self.conflicts += 1
+        if formula.__class__ is Not:
+            self.negated.add(formula.operand)
+            if formula.operand in self.counts: self.conflicts += 1
+
+    def uncountFormula(self,formula) -> None:
+        # Remove the assumption from the multiset, together with the pairs it completed
+        count = self.counts[formula]
+        if count > 1:
+            self.counts[formula] = count - 1
+            return
+        del self.counts[formula]
+        if formula in self.negated: self.conflicts -= 1
+        if formula.__class__ is Not:
+            self.negated.discard(formula.operand)
+            if formula.operand in self.counts: self.conflicts -= 1
+
+    def contains(self,formula) -> bool:
+        # Whether the formula is among the assumptions
+        if self.counts is None: self.buildCounts()
+        return formula in self.counts
+
+    def contradictory(self) -> bool:
+        # Whether the assumptions contain false or a formula together with its negation
+        if self.counts is None: self.buildCounts()
+        return bool(self.conflicts) or Or() in self.counts
+
+    def setFormula(self,index,formula) -> None:
+        if index < 0: index += len(self.formulas)
+        # Replace the formula also in the hash, the index and the multiset, unless it is the goal
+        if index < len(self.formulas) - 1:
+            self.assumption_hash = (self.assumption_hash - self.formulas[index].hash + formula.hash) & State.hash_mask
+            if self.index is not None:
+                self.index[State.shape(self.formulas[index])].remove(index)
+                bisect.insort(self.index.setdefault(State.shape(formula),[]),index)
+            if self.counts is not None:
+                self.uncountFormula(self.formulas[index])
+                self.countFormula(formula)
+        self.formulas[index] = formula
+
+    def insertFormula(self,formula) -> None:
+        # Add a new assumption just before the goal, so that positions of the other assumptions stay the same
+        index = len(self.formulas) - 1
+        self.formulas.insert(index,formula)
+        self.assumption_hash = (self.assumption_hash + formula.hash) & State.hash_mask
+        if self.index is not None: self.index.setdefault(State.shape(formula),[]).append(index)
+        if self.counts is not None: self.countFormula(formula)
+
+    def deleteFormula(self,index) -> None:
+        # Delete the assumption at the given position, the last assumption takes its place
+        # Order of the assumptions does not matter to the key, the axioms nor the embedding
+        last = len(self.formulas) - 2
+        formula = self.formulas[index]
+        self.assumption_hash = (self.assumption_hash - formula.hash) & State.hash_mask
+        if self.index is not None:
+            self.index[State.shape(formula)].remove(index)
+            if index != last:
+                self.index[State.shape(self.formulas[last])].pop()
+                bisect.insort(self.index[State.shape(self.formulas[last])],index)
+        if self.counts is not None: self.uncountFormula(formula)
+        self.formulas[index] = self.formulas[last]
+        del self.formulas[last]
+
+    def appendFormula(self,formula) -> None:
+        # Set a new goal, the current one becomes the last assumption
+        self.assumption_hash = (self.assumption_hash + self.formulas[-1].hash) & State.hash_mask
+        if self.index is not None: self.index.setdefault(State.shape(self.formulas[-1]),[]).append(len(self.formulas) - 1)
+        if self.counts is not None: self.countFormula(self.formulas[-1])
+        self.formulas.append(formula)
+
+    def simplifyFormulas(self):
+        # Replace the formulas by their simplified versions, keeping the first unsimplified state for the proof
+        for f,formula in enumerate(self.formulas):
+            simplified = simplify(formula)
+            if simplified is not formula:
+                if self.original is None: self.original = self.copy(self.deterministic)
+                self.setFormula(f,simplified)
+        return self
 
     def possibleActions(self):
         possible_actions = []
-        # Loop all actions and decide, whether they are applicable
+        # Loop all actions and get the sequents they can be applied to, looked up in the index
         for action in Action.__subclasses__():
-            if action.applicable(self):possible_actions.append(action)
-        # Return list of applicable actions
+            sequents = action.applicable(self)
+            if sequents: possible_actions.append((action,sequents))
+        # Return list of pairs of applicable actions and their sequents
         return possible_actions
 
     def applyAction(self,action):
         # Copy the given state and create a new one with the same formulas
-        new_state = action(State(*self.formulas))
+        new_state = action(self.copy())
         return new_state
 
     def fitAxioms(self):
@@ -58,48 +185,31 @@ class State():
         else: return False
 
     def __str__(self) -> str:
+        return State.sequent(self.formulas)
+
+    @staticmethod
+    def sequent(formulas) -> str:
         # Get string versions of all assumption formulas
-        str_formulas = [str(formula) for formula in self.formulas[:-1]]
+        str_formulas = [str(formula) for formula in formulas[:-1]]
         # Sort them
         str_formulas.sort()
         # Create a string representation of assumption
         str_rep = ""
         for formula in str_formulas: str_rep += f";{formula}"
         # Create a string representation of the whole state
-        return f"{str_rep[1:]} ==> {str(self.formulas[-1])}"
+        return f"{str_rep[1:]} ==> {str(formulas[-1])}"
+
+    @property
+    def key(self) -> int:
+        # Canonical key of the state: assumptions are taken as a multiset, the goal separately
+        return hash((self.assumption_hash,self.formulas[-1].hash))
 
     def __hash__(self) -> int:
-        try:
-            to_return = hash(str(self))
-        except RecursionError:
-            to_return = hash("This is too complex to be the right way")
-        return to_return
+        return self.key
 
     def embedde(self):
-        str_rep = str(self)
-        tokens = str_rep.split()
-        vectors = []
-        level = 0
-        pos = 0
-        for t in range(60):
-            if t < len(tokens):
-                toptok = tokens[t]
-                if toptok == "==>": continue
-                for tok in toptok.split(";"):
-                    level += tok.count("(") - tok.count(")")
-                    main_vect = State.embedde_token(tok)
-                    main_vect[-1] = level
-                    added_vect = np.zeros(4)
-                    if main_vect[-2] and level < 3:
-                        var = tok.replace("(","").replace(")","").replace("-","")
-                        added_vect[0] = str_rep.count(f"-({var})")
-                        added_vect[1] = str_rep.count(f" {var};") + str_rep.count(f";{var} ")
-                        added_vect[2] = (pos - str_rep.index(var))/len(str_rep)
-                        added_vect[3] = (len(str_rep) + str_rep[::-1].index(var[::-1]) + pos)/len(str_rep)
-                    vectors.append(np.concatenate([main_vect,added_vect]).transpose())
-                    pos += 1
-            else: vectors.append(np.zeros(11))
-        return np.vstack(vectors)
+        # Features of the nodes of the formulas for the RL model, as a (60, 11) array
+        return embed(self)
 
 # Actions
 
@@ -110,27 +220,20 @@ class Action():
         return False
     
     @staticmethod
-    def recursive_replacement(formula:Connective,replace_dict:dict,formula_replacement:bool = False) -> Connective:
-        # Get all successors of the given connective
-        successors = [formula.successor] if isinstance(formula,Quantifier) else [formula.operand] if isinstance(formula,Not) else formula.operands
-        # Loop the successors
-        for s,successor in enumerate(successors):
-            # If the successor is a literal with value contained in replace_dict, replace it
-            # Check, if the value is literal
-            if isinstance(successor,Literal):
-                if successor.value in replace_dict.keys():
-                    # If formula_replacement is set to true, exchange literals in current connective for given objects 
-                    if formula_replacement:
-                        if isinstance(formula,Not):
-                            formula.operand = replace_dict[successor.value]
-                        else:
-                            formula.operands[s] = replace_dict[successor.value]
-                    # Otherwise just change the literal value
-                    else:
-                        successors[s].value = replace_dict[successor.value].value
-            # If the value is not literal, call recursive_replacement on it
-            else:
-                Action.recursive_replacement(successor,replace_dict,formula_replacement=formula_replacement)
+    def recursive_replacement(formula:Connective,replace_dict:dict) -> Connective:
+        # Formulas are immutable, so a new formula with replaced parts is built and returned
+        # If the formula itself is contained in replace_dict, replace it
+        if formula in replace_dict: return replace_dict[formula]
+        # Literals not contained in replace_dict stay as they are
+        if isinstance(formula,Literal): return formula
+        if isinstance(formula,Quantifier):
+            # Variables bounded by the quantifier are not replaced inside of its scope
+            inner_dict = {key:value for key,value in replace_dict.items() if key not in formula.variables}
+            return formula.__class__(*formula.variables,successor = Action.recursive_replacement(formula.successor,inner_dict))
+        if isinstance(formula,Not):
+            return Not(Action.recursive_replacement(formula.operand,replace_dict))
+        # Call recursive_replacement on all operands of the gate
+        return formula.__class__(*[Action.recursive_replacement(operand,replace_dict) for operand in formula.operands])
 
     @staticmethod
     def instantiates():
@@ -142,17 +245,13 @@ class EliminateDoubleNegation(Action):
 
     @staticmethod
     def applicable(state:State) -> list:
-        possible_sequents = []
-        for f,formula in enumerate(state.formulas):
-            if isinstance(formula,Not) and isinstance(formula.operand,Not):
-                possible_sequents.append(f)
-        return possible_sequents
+        return state.positions((Not,Not))
 
     @staticmethod
     def apply(state:State,formula:int) -> State:
         cursor = state.formulas[formula].operand.operand
         # Return the state with given formula negated at most once
-        state.formulas[formula] = EliminateDoubleNegation.cursorize(cursor)
+        state.setFormula(formula,EliminateDoubleNegation.cursorize(cursor))
         return state
     
     @staticmethod
@@ -176,8 +275,8 @@ class NegateGoal(Action):
 
     @staticmethod
     def apply(state:State,formula:int) -> State:
-        state.formulas[-1] = Not(state.formulas[-1])
-        state.formulas.append(Or())
+        state.setFormula(-1,Not(state.formulas[-1]))
+        state.appendFormula(Or())
         return state
     
 class NegateSequent(Action):
@@ -192,28 +291,24 @@ class NegateSequent(Action):
     @staticmethod
     def apply(state:State,formula:int) -> State:
         # Set goal of state to the negation of given sequent
-        state.formulas[-1] = Not(state.formulas[formula])
+        state.setFormula(-1,Not(state.formulas[formula]))
         # If there were multiple formulas in assumption, delete the negated one
-        if len(state.formulas) - 2: del state.formulas[formula]
+        if len(state.formulas) - 2: state.deleteFormula(formula)
         # Otherwise insert true constant into assumption
-        else: state.formulas[formula] = And()
+        else: state.setFormula(formula,And())
         return state
 
 # De Morgan laws
-class DeMorganAbstract(Action):
+class DeMorganAbstract:
 
     @staticmethod
     def checkApplicability(state:State,from_class:type):
-        possible_sequents = []
-        # Check that there is a negation of given connective among the formulas
-        for f,formula in enumerate(state.formulas):
-            if isinstance(formula,Not) and isinstance(formula.operand,from_class):
-                possible_sequents.append(f)
-        return possible_sequents
+        # Get all negations of given connective among the formulas
+        return state.positions((Not,from_class))
     
     @staticmethod
     def apply(state:State,to_class:type,formula:int):
-        state.formulas[formula] = to_class(*[Not(operand) for operand in state.formulas[formula].operand.operands])
+        state.setFormula(formula,to_class(*[Not(operand) for operand in state.formulas[formula].operand.operands]))
         return state
 
 class DeMorganAnd(Action):
@@ -245,7 +340,7 @@ class DeMorganExistential(Action):
     @staticmethod
     def apply(state:State,formula:int) -> State:
         variables = state.formulas[formula].operand.variables
-        state.formulas[formula] = Universal(*variables,successor = Not(state.formulas[formula].operand.successor))
+        state.setFormula(formula,Universal(*variables,successor = Not(state.formulas[formula].operand.successor)))
         return state
         #return DeMorganAbstract.apply(state,Universal,formula)
 
@@ -258,30 +353,30 @@ class DeMorganUniversal(Action):
     @staticmethod
     def apply(state:State,formula:int) -> State:
         variables = state.formulas[formula].operand.variables
-        state.formulas[formula] = Existential(*variables,successor = Not(state.formulas[formula].operand.successor))
+        state.setFormula(formula,Existential(*variables,successor = Not(state.formulas[formula].operand.successor)))
         return state
         #return DeMorganAbstract.apply(state,Existential,formula)
 
 # Quantifier replacement rules
-class QuantifierReplacementAbstract(Action):
+class QuantifierReplacementAbstract:
 
     @staticmethod
     def checkApplicability(state:State,from_class:type):
-        possible_sequents = []
         # Get all occurences of given  quantifier among states of the formula
-        for f,formula in enumerate(state.formulas):
-            if isinstance(formula,from_class):
-                possible_sequents.append(f)
-        return possible_sequents
+        return state.positions(from_class)
     
+    # Whether quantifiers are expanded one variable at a time, the remaining variables staying quantified in the cofactors
+    # Otherwise all assignments of the variables are expanded at once
+    shannon = True
+
     @staticmethod
     def apply(state:State,to_class:type,formula:int):
-        new_state = State(*state.formulas)
+        if QuantifierReplacementAbstract.shannon: return QuantifierReplacementAbstract.expandVariable(state,to_class,formula)
         # Get variables bounded by the quantifier
         variables = state.formulas[formula].variables
         # Get all combinations of those variables that could be true
         true_assignments = []
-        for true_count in range(len(variables)):
+        for true_count in range(len(variables) + 1):
             true_assignments += itertools.combinations(variables,true_count)
         # Loop those combination and replace variables in successor formula with corresponding truth constants
         operands = []
@@ -290,11 +385,40 @@ class QuantifierReplacementAbstract(Action):
             # Assign true constant to varibles contained in the combination and false to the rest
             replace_dict = {var:And() if var in true_assignment else Or() for var in variables}
             # Add successor formula with bounded variables to be replaced by truth constants
-            operands.append(Action.recursive_replacement(new_state.formulas[formula].successor,replace_dict,formula_replacement = True))
+            operands.append(Action.recursive_replacement(state.formulas[formula].successor,replace_dict))
         # Create a new connective with previous combinations as its operands
-        state.formulas[formula] = to_class(*operands)
+        state.setFormula(formula,to_class(*operands))
+        return state
+
+    @staticmethod
+    def expandVariable(state:State,to_class:type,formula:int):
+        # Shannon expansion of the first variable: the quantifier over the rest of the variables
+        # with the first one set to false and to true, joined by to_class
+        quantifier = state.formulas[formula]
+        variable, rest = quantifier.variables[0], quantifier.variables[1:]
+        operands = []
+        for value in (Or(),And()):
+            cofactor = QuantifierReplacementAbstract.cofactor(quantifier.successor,variable,value,{})
+            if rest: cofactor = fold(quantifier.__class__(*rest,successor = cofactor))
+            operands.append(cofactor)
+        state.setFormula(formula,fold(to_class(*operands)))
         return state
 
+    @staticmethod
+    def cofactor(formula:Connective,variable:Literal,value:Connective,cache:dict) -> Connective:
+        # The formula with free occurences of the variable replaced by the truth constant and constants folded
+        # Subformulas without the variable are shared, not rebuilt, cache holds the cofactors of the visited ones
+        # Operands are replaced first, without recursion on deep formulas
+        contains = lambda node: variable in free_occurrences(node)
+        for node in postorder(formula,cache,contains):
+            if not contains(node): result = node
+            elif node is variable: result = value
+            elif isinstance(node,Quantifier): result = fold(node.__class__(*node.variables,successor = cache[node.successor]))
+            elif isinstance(node,Not): result = fold(Not(cache[node.operand]))
+            else: result = fold(node.__class__(*[cache[operand] for operand in node.operands]))
+            cache[node] = result
+        return cache[formula]
+
 class ExistentialReplacement(Action):
     
     @staticmethod
@@ -316,16 +440,12 @@ class UniversalReplacement(Action):
         return QuantifierReplacementAbstract.apply(state,And,formula)
 
 # Assumption rules
-class AssumptionAbstract(Action):
+class AssumptionAbstract:
 
     @staticmethod
     def checkApplicability(state:State,subclass:type) -> list:
-        possible_sequents = []
-        # Check if the given connective is present in assumption
-        for f,formula in enumerate(state.formulas[:-1]):
-            if isinstance(formula,subclass):
-                possible_sequents.append(f)
-        return possible_sequents
+        # Get all occurences of the given connective in assumption
+        return state.positions(subclass,goal = False)
  
 class AndAssumption(Action):
 
@@ -336,8 +456,8 @@ class AndAssumption(Action):
     @staticmethod
     def apply(state:State,formula:int) -> State:
         operands = state.formulas[formula].operands
-        del state.formulas[formula]
-        for operand in operands: state.formulas.insert(0,operand)
+        state.deleteFormula(formula)
+        for operand in operands: state.insertFormula(operand)
         return state
 
 class OrAssumption(Action):
@@ -349,13 +469,12 @@ class OrAssumption(Action):
     @staticmethod
     def apply(state:State,formula:int) -> State:
         operands = state.formulas[formula].operands
-        formulas = state.formulas
         to_return = []
         # For each operand of the selected formula, create a new branch with this operand replacing original formula
         for operand in operands:
-            new_formulas = formulas.copy()
-            new_formulas[formula] = operand            
-            to_return.append(State(*new_formulas))
+            new_state = state.copy()
+            new_state.setFormula(formula,operand)
+            to_return.append(new_state)
         return to_return
 
 class XorAssumption(Action):
@@ -367,19 +486,34 @@ class XorAssumption(Action):
     @staticmethod
     def apply(state:State,formula:int) -> State:
         operands = state.formulas[formula].operands
-        formulas = state.formulas
         to_return = []
         # For each operand of the given formula, create a new branch, where this operand is as it is and others are negated
         for o1,operand in enumerate(operands):
             # Add non-negated operand
-            new_formulas = formulas.copy()
-            new_formulas[formula] = operand
+            new_state = state.copy()
+            new_state.setFormula(formula,operand)
             # Add negated operands
             for o2,neg_operand in enumerate(operands):
-                if o1 != o2: new_formulas.insert(0,Not(neg_operand))          
-            to_return.append(State(*new_formulas))
+                if o1 != o2: new_state.insertFormula(Not(neg_operand))
+            to_return.append(new_state)
         return to_return
 
+# Instantiation rules
+class InstantiationAbstract:
+
+    # Provider of the terms variables can be assigned, replaceable e.g. by one ranking them by the RL model
+    terms = TermProvider()
+
+    @staticmethod
+    def getAssignments(state:State,formula:int):
+        variables = state.formulas[formula].variables
+        # Get literals occuring free in the sequent, which can be used for assignment, in the order they should be tried
+        possible_assignment = InstantiationAbstract.terms.candidates(state,formula)
+        # Yield the assignments one by one, each of them exactly once
+        # Several variables can be assigned the same literal
+        for assignment in itertools.product(possible_assignment,repeat = len(variables)):
+            yield dict(zip(variables,assignment))
+
 class UniversalAssumption(Action):
 
     @staticmethod
@@ -388,27 +522,15 @@ class UniversalAssumption(Action):
 
     @staticmethod
     def apply(state:State,formula:int,replace_dict) -> State:
-        new_state = State(*state.formulas, deterministic = state.deterministic)
+        new_state = state.copy(deterministic = state.deterministic)
         # Replace the universal quantifier in the assumption by its successor formula.
-        new_state.formulas[formula] = new_state.formulas[formula].successor
         # Replace variables in this successor formula by the corresponding value from the replace_dict
-        Action.recursive_replacement(new_state.formulas[formula],replace_dict)
+        new_state.setFormula(formula,Action.recursive_replacement(new_state.formulas[formula].successor,replace_dict))
         return new_state
     
     @staticmethod
     def getAssignments(state:State,formula:int):
-        assignments = []
-        variables = state.formulas[formula].variables
-        # Get variables bounded in the successor formula
-        successor_bounded = state.formulas[formula].successor.getBoundedLiterals()
-        # Get all variables which can be used for assignment. Exclude those bounded by the quantifier or by its successors.
-        possible_assignment = set(Literal.used_tokens) - set(variables + successor_bounded)
-        # Get all possible assignments of quantifier bounded variables
-        for key_combination in itertools.permutations(variables):
-            for assignment in itertools.combinations(possible_assignment,len(variables)):
-                # Add the assignment to the list
-                assignments.append({key_combination[i]:assignment[i] for i in range(len(variables))})
-        return assignments
+        return InstantiationAbstract.getAssignments(state,formula)
     
     @staticmethod
     def instantiates():
@@ -422,17 +544,16 @@ class ExistentialAssumption(Action):
 
     @staticmethod
     def apply(state:State,formula:int) -> State:
-        new_state = State(*state.formulas)
+        new_state = state.copy()
         # Create skolemn variables as a replacement for those bounded by the quantifier
-        replace_dict = {var:Literal.get_new(skolemn=True) for var in new_state.formulas[formula].variables}
+        replace_dict = {var:var.table.fresh(skolemn = True) for var in new_state.formulas[formula].variables}
         # Replace the existential quantifier in the assumption by its successor formula.
-        new_state.formulas[formula] = new_state.formulas[formula].successor
         # Replace variables in this successor formula by the corresponding value from the replace_dict
-        Action.recursive_replacement(new_state.formulas[formula],replace_dict)
+        new_state.setFormula(formula,Action.recursive_replacement(new_state.formulas[formula].successor,replace_dict))
         return new_state
 
 # Goal rules
-class GoalAbstract(Action):
+class GoalAbstract:
 
     @staticmethod
     def checkApplicability(state:State,subclass:type) -> list:
@@ -448,13 +569,12 @@ class AndGoal(Action):
     @staticmethod
     def apply(state:State,formula:int) -> State:
         operands = state.formulas[formula].operands
-        formulas = state.formulas
         to_return = []
         # For each operand, create a new branch with this operand as its goal
         for operand in operands:
-            new_formulas = formulas.copy()
-            new_formulas[formula] = operand            
-            to_return.append(State(*new_formulas))
+            new_state = state.copy()
+            new_state.setFormula(formula,operand)
+            to_return.append(new_state)
         return to_return
 
 class OrGoal(Action):
@@ -466,14 +586,13 @@ class OrGoal(Action):
     @staticmethod
     def apply(state:State,formula:int) -> State:
         operands = state.formulas[formula].operands
-        formulas = state.formulas
         to_return = []
         # For each operand, create a new branch with this operand as its goal
         for operand in operands:
-            new_formulas = formulas.copy()
-            new_formulas[formula] = operand
-            # Set those new branches as indeterministic            
-            to_return.append(State(*new_formulas, deterministic= False))
+            # Set those new branches as indeterministic
+            new_state = state.copy(deterministic = False)
+            new_state.setFormula(formula,operand)
+            to_return.append(new_state)
         return to_return
 
 class XorGoal(Action):
@@ -486,8 +605,11 @@ class XorGoal(Action):
     def apply(state:State,formula:int) -> State:
         # Create two new branches corresponding to moving negated xor to assumption
         xor = state.formulas[formula]
-        state.formulas[formula] = Or()
-        return [State(*xor.operands,*state.formulas),State(Or(*xor.operands),*state.formulas)]
+        state.setFormula(formula,Or())
+        first_branch, second_branch = state.copy(), state.copy()
+        for operand in xor.operands: first_branch.insertFormula(operand)
+        second_branch.insertFormula(Or(*xor.operands))
+        return [first_branch,second_branch]
 
 class UniversalGoal(Action):
 
@@ -497,13 +619,12 @@ class UniversalGoal(Action):
 
     @staticmethod
     def apply(state:State,formula:int) -> State:
-        new_state = State(*state.formulas)
+        new_state = state.copy()
         # Create skolemn variables as a replacement for those bounded by the quantifier
-        replace_dict = {var:Literal.get_new(skolemn=True) for var in new_state.formulas[formula].variables}
+        replace_dict = {var:var.table.fresh(skolemn = True) for var in new_state.formulas[formula].variables}
         # Replace the universal quantifier in the assumption by its successor formula.
-        new_state.formulas[formula] = new_state.formulas[formula].successor
         # Replace variables in this successor formula by the corresponding value from the replace_dict
-        Action.recursive_replacement(new_state.formulas[formula],replace_dict)
+        new_state.setFormula(formula,Action.recursive_replacement(new_state.formulas[formula].successor,replace_dict))
         return new_state
 
 class ExistentialGoal(Action):
@@ -514,9 +635,8 @@ class ExistentialGoal(Action):
 
     @staticmethod
     def apply(state:State,formula:int,replace_dict) -> State:
-        new_state = State(*state.formulas, deterministic = state.deterministic)
-        new_state.formulas[formula] = new_state.formulas[formula].successor
-        Action.recursive_replacement(new_state.formulas[formula],replace_dict)
+        new_state = state.copy(deterministic = state.deterministic)
+        new_state.setFormula(formula,Action.recursive_replacement(new_state.formulas[formula].successor,replace_dict))
         return new_state
         
     @staticmethod
@@ -525,15 +645,4 @@ class ExistentialGoal(Action):
     
     @staticmethod
     def getAssignments(state:State,formula:int):
-        assignments = []
-        variables = state.formulas[formula].variables
-        # Get variables bounded in the successor formula
-        successor_bounded = state.formulas[formula].successor.getBoundedLiterals()
-        # Get all variables which can be used for assignment. Exclude those bounded by the quantifier or by its successors.
-        possible_assignment = set(Literal.used_tokens) - set(variables + successor_bounded)
-        # Get all possible assignments of quantifier bounded variables
-        for key_combination in itertools.permutations(variables):
-            for assignment in itertools.combinations(possible_assignment,len(variables)):
-                # Add the assignment to the list
-                assignments.append({key_combination[i]:assignment[i] for i in range(len(variables))})
-        return assignments
\ No newline at end of file
+        return InstantiationAbstract.getAssignments(state,formula)
@@ -0,0 +1,249 @@
+import random, time
+from rules import EliminateDoubleNegation, NegateSequent
+from connectives import Literal, Not
+from transposition import PROVED, FAILED
+from proof import Proof
+
+# Outcomes of a search, next to PROVED
+NOT_FOUND = "not found"
+BUDGET_EXHAUSTED = "budget exhausted"
+CANCELLED = "cancelled"
+
+# AND/OR proof search driven by an explicit stack
+# Every searched state has a frame - a generator which yields states it needs proved and receives their proofs.
+# The search itself loops over the stack of frames, so its depth is not limited by Python recursion.
+class Search:
+
+    # Number of steps after which the time limit and cancellation are checked
+    check_interval = 64
+
+    def __init__(self,transposition_table,max_depth = None,seed = None,instrumentation = None,simplify = False) -> None:
+        self.transposition_table = transposition_table
+        # Whether formulas of the states resulting from actions are simplified
+        self.simplify = simplify
+        # Random generator shuffling the actions, seeded for reproducible searches
+        self.random = random.Random(seed)
+        # States deeper than max_depth are not searched and count as not proved
+        self.max_depth = max_depth
+        # Pairs (state, frame) of states being searched, starting from the root
+        self.stack = []
+        # Number of expanded states and of states cut off by max_depth
+        self.nodes = 0
+        self.cutoffs = 0
+        self.steps = 0
+        self.result = None
+        self.status = None
+        # Instrumentation replaces some methods of the search by recording ones
+        if instrumentation is not None: instrumentation.attach(self)
+
+    def start(self,root) -> None:
+        self.stack = [(root,self.expand(root,0))]
+        self.sent = None
+        self.result = None
+
+    def step(self) -> bool:
+        # Advance the search by one state, return False once it is finished
+        state, frame = self.stack[-1]
+        try:
+            child = frame.send(self.sent)
+        except StopIteration as finished:
+            # The state was either proved or not, pass the result to its parent
+            self.stack.pop()
+            self.sent = finished.value
+            if not self.stack:
+                self.result = finished.value
+                return False
+            return True
+        self.sent = self.visit(child)
+        return True
+
+    def run(self,root,max_nodes = None,deadline = None,cancelled = None):
+        # Search until the root is resolved, the number of expanded states reaches max_nodes,
+        # time.monotonic() passes the deadline or cancelled() returns true
+        self.start(root)
+        self.status = None
+        while self.step():
+            self.steps += 1
+            if max_nodes is not None and self.nodes >= max_nodes:
+                self.status = BUDGET_EXHAUSTED
+            elif not self.steps % Search.check_interval:
+                if deadline is not None and time.monotonic() >= deadline: self.status = BUDGET_EXHAUSTED
+                elif cancelled is not None and cancelled(): self.status = CANCELLED
+            # Stopped search leaves its states unfinished
+            if self.status is not None:
+                self.stack = []
+                self.transposition_table.abandon()
+                self.result = None
+                return None
+        self.result = Search.unsimplify(root,self.result)
+        self.status = PROVED if self.result else NOT_FOUND
+        return self.result
+
+    def deepen(self,root,max_depth = None,increment = 1,**budget):
+        # Iterative deepening: search with increasing depth limit until a proof is found
+        # or the search is not cut off by the limit anymore
+        depth_limit = increment
+        while True:
+            self.max_depth = depth_limit
+            self.cutoffs = 0
+            proof = self.run(root,**budget)
+            if proof or not self.cutoffs or self.status != NOT_FOUND: return proof
+            if max_depth is not None and depth_limit >= max_depth: return None
+            depth_limit += increment
+
+    def visit(self,child):
+        depth = len(self.stack)
+        # If the resulting state was already found, get its result from the transposition table
+        entry = self.transposition_table.lookup(hash(child))
+        if entry is not None and (entry.horizon is None or (self.max_depth is not None and self.max_depth - depth <= entry.horizon)):
+            # A failure caused by the depth limit is a cutoff here as well, so that it does not become final in the ancestors
+            if entry.horizon is not None: self.cutoffs += 1
+            return entry.proof
+        # States over the depth limit are not searched
+        if self.max_depth is not None and depth > self.max_depth:
+            self.cutoffs += 1
+            return None
+        # Otherwise create a frame for the state, it will be started by the next step
+        self.stack.append((child,self.expand(child,depth)))
+        return None
+
+    def expand(self,state,depth):
+        #  **** DOES THE STATE FIT THE AXIOMS? ****
+        # Check whether the given state already fit axioms
+        fiting_axiom = state.fitAxioms()
+        # If true, return the state together with fulfilled axiom
+        if fiting_axiom:
+            return Proof(state,fiting_axiom)
+        # If not, save the current state to transpostition table as 'yet unsolved'
+        self.nodes += 1
+        self.transposition_table.begin(hash(state),depth)
+        cutoffs = self.cutoffs
+
+        #  **** APPLY ACTIONS ****
+        for action,result in self.alternatives(state):
+            proof = yield from self.prove(state,action,result)
+            # If the proof was found, add it to the transposition table and return it
+            if proof:
+                self.transposition_table.store(hash(state),PROVED,proof,depth)
+                return proof
+
+        # If no of the actions resulted into proof, return "proof not found"
+        # If some states were cut off by the depth limit, the failure holds only for searches not reaching deeper
+        horizon = None if self.cutoffs == cutoffs else self.max_depth - depth
+        self.transposition_table.store(hash(state),FAILED,depth = depth,horizon = horizon)
+        return None
+
+    def alternatives(self,state,lazy = False):
+        # Yield pairs of action and its result - a resulting state or a list of them
+        # With lazy, instantiating actions are yielded with their sequent instead, its states are created by instantiations()
+        # Loop actions in the preferred order, together with indices of sequents where they can be applied
+        for action,sequents in self.orderActions(state):
+            # Apply action on every possible sequent
+            for sequent in sequents:
+                # In case of ExistentialGoal or UniversalAssumption, apply the action for each possible instantiation
+                # Instantiations are alternatives of their own, each is created only once the previous ones failed
+                if action.instantiates():
+                    if lazy: yield action,sequent
+                    else:
+                        for result in self.instantiations(state,action,sequent): yield action,result
+                    continue
+                try:
+                    # Otherwise simply apply the action
+                    result = self.prepare(self.simplifyResult(action.apply(state.copy(),sequent)))
+                # If a recursion error occurs during action aplication, continue to the next sequent
+                except RecursionError:
+                    print("Reccursion error occured")
+                    continue
+                yield action,result
+
+    def instantiations(self,state,action,sequent):
+        # Yield states resulting from the instantiations of the sequent, each applied only once it is requested
+        assignments = action.getAssignments(state,sequent)
+        while True:
+            try:
+                replace_dict = next(assignments,None)
+                if replace_dict is None: return
+                result = self.prepare(self.simplifyResult(action.apply(state.copy(deterministic = False),sequent,replace_dict)))
+            # If a recursion error occurs during instantiation, continue to the next sequent
+            except RecursionError:
+                print("Reccursion error occured")
+                return
+            yield result
+
+    def simplifyResult(self,result):
+        # Simplify formulas of the resulting state or states, if enabled
+        if self.simplify:
+            for res_state in (result if isinstance(result,list) else [result]): res_state.simplifyFormulas()
+        return result
+
+    def prove(self,state,action,result):
+        # If application of action resulted into a single state, it has to be proved
+        if not isinstance(result,list):
+            subproof = Search.unsimplify(result,(yield result))
+            proof = Proof(state,action.__name__,subproof) if subproof else None
+        # If the list is empty, there is nothing to prove
+        elif not len(result):
+            return None
+        # If the branches are indeterministic, proof of any of them is enough
+        elif not result[0].deterministic:
+            proof = None
+            for res_state in result:
+                subproof = Search.unsimplify(res_state,(yield res_state))
+                if subproof:
+                    proof = Proof(state,action.__name__,subproof)
+                    break
+        # If the branches are deterministic, all of them have to be proved
+        else:
+            prooflist = []
+            for res_state in result:
+                subproof = Search.unsimplify(res_state,(yield res_state))
+                if not subproof: break
+                prooflist.append(subproof)
+            # Combine the proofs of all branches
+            proof = Proof(state,action.__name__,*prooflist,branching = True) if len(prooflist) == len(result) else None
+        self.feedback(state,action,proof)
+        return proof
+
+    @staticmethod
+    def unsimplify(state,proof):
+        # Proof of the state as it was before its formulas were simplified, if they were
+        if proof and state.original is not None: return Proof(state.original,"Simplification",proof)
+        return proof
+
+    def possibleActions(self,state) -> list:
+        # Pairs of applicable actions and their sequents
+        return state.possibleActions()
+
+    def orderActions(self,state) -> list:
+        # Get all applicable actions and shuffle them
+        possible_actions = self.possibleActions(state)
+        self.random.shuffle(possible_actions)
+        return Search.heuristics(state,possible_actions)
+
+    @staticmethod
+    def heuristics(state,possible_actions) -> list:
+        # Some heuristics needed to make brute force at least somewhat useful
+        actions = [action for action,sequents in possible_actions]
+        # Heuristics: if possible, eliminate double negation
+        if EliminateDoubleNegation in actions:
+            possible_actions.insert(0, possible_actions.pop(actions.index(EliminateDoubleNegation)))
+            actions = [action for action,sequents in possible_actions]
+        # Heuristics: sequent negation is the least preferred operation
+        if NegateSequent in actions:
+            negate_sequent = possible_actions.pop(actions.index(NegateSequent))
+            nonliteral_knowledge = False
+            # And is forbidden, if there are only (negated) literals in the knowledge base
+            for formula in state.formulas[:-1]:
+                if not isinstance(formula,Literal) and (not isinstance(formula,Not) or (not isinstance(formula.operand, Literal) and not isinstance(formula.operand, Not))):
+                    nonliteral_knowledge = True
+                    break
+            if nonliteral_knowledge:possible_actions.append(negate_sequent)
+        return possible_actions
+
+    def prepare(self,state):
+        # Hook for adjusting a state resulting from an action before it is searched
+        return state
+
+    def feedback(self,state,action,proof) -> None:
+        # Hook called once it is known whether the action applied to the state led to a proof
+        pass
@@ -0,0 +1,92 @@
+import argparse, json, multiprocessing, os, sys, time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import numpy as np
+import torch
+from task_generator import generate_formula
+from transposition import TranspositionTable
+from model import RLModel
+from replay import ReplayBuffer, train
+from training_rl import ReinforcementSearch
+
+# Self-play pipeline: worker processes search generated formulas guided by a snapshot of the model
+# and write the outcomes of the actions into .npz shards, the learner trains on the shards and publishes new weights
+# Usage: python selfplay.py --shards 64 --workers 8 --episodes 16 --complexity 5
+
+def publish(model,path) -> None:
+    # Write the weights so that workers never read a partially written file
+    temporary = path + ".tmp"
+    model.save(temporary)
+    os.replace(temporary,path)
+
+def play(shard,seed,weights,directory,episodes = 16,complexity = 5,max_nodes = 500) -> dict:
+    # Search episodes formulas generated from the seed by the frozen model and write their transitions into a shard
+    start = time.monotonic()
+    np.random.seed(seed)
+    # Workers run side by side, each of them uses a single thread
+    torch.set_num_threads(1)
+    model = RLModel.load(weights)
+    model.eval()
+    # Memory of the buffer is taken only by the transitions actually stored
+    replay_buffer = ReplayBuffer()
+    proved = 0
+    with torch.inference_mode():
+        for episode in range(episodes):
+            search = ReinforcementSearch(TranspositionTable(max_bytes = 2**28),replay_buffer,train_every = None,model = model)
+            if search.run(generate_formula(complexity),max_nodes = max_nodes): proved += 1
+    path = os.path.join(directory,f"shard_{shard:06d}.npz")
+    replay_buffer.save(path)
+    return {"shard":path,"seed":seed,"episodes":episodes,"proved":proved,"transitions":len(replay_buffer),
+            "time":time.monotonic() - start,"cache_hit_rate":model.cache.stats()["hit_rate"]}
+
+def learn(shards,directory,workers = None,episodes = 16,complexity = 5,max_nodes = 500,
+          batch_size = 64,batches = 32,publish_every = 1,capacity = 2**17,seed = 0,lr = 1e-2):
+    # Generate shards by the worker processes, train on every finished one and publish the weights after every publish_every of them
+    # Yield a summary of each shard once the learner trained on it
+    os.makedirs(directory,exist_ok = True)
+    weights = os.path.join(directory,"weights.pt")
+    model = RLModel()
+    optimizer = torch.optim.Adam(model.parameters(),lr = lr)
+    # Published weights carry the version of the model, increased by every step of the optimizer
+    model.watch(optimizer)
+    publish(model,weights)
+    replay_buffer = ReplayBuffer(capacity = capacity,seed = seed)
+    workers = workers or os.cpu_count()
+    # Workers are spawned, forking a process with torch threads running may deadlock
+    with ProcessPoolExecutor(workers,mp_context = multiprocessing.get_context("spawn")) as pool:
+        submitted = 0
+        trained = 0
+        running = set()
+        while submitted < shards or running:
+            # Keep every worker busy, each shard is generated with the latest published weights
+            while submitted < shards and len(running) < workers:
+                running.add(pool.submit(play,submitted,seed + submitted,weights,directory,episodes,complexity,max_nodes))
+                submitted += 1
+            finished, running = wait(running,return_when = FIRST_COMPLETED)
+            for future in finished:
+                summary = future.result()
+                replay_buffer.load(summary["shard"])
+                summary["loss"] = train(model,optimizer,replay_buffer,batch_size,batches)
+                trained += 1
+                if not trained % publish_every: publish(model,weights)
+                summary["buffer"] = len(replay_buffer)
+                yield summary
+    publish(model,weights)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Train the RL model on shards of self-play generated by worker processes.")
+    parser.add_argument("--shards",type = int,default = 64,help = "number of shards to generate")
+    parser.add_argument("--directory",default = "selfplay",help = "directory of the shards and of the published weights")
+    parser.add_argument("--workers",type = int,default = None,help = "number of worker processes (default: number of CPUs)")
+    parser.add_argument("--episodes",type = int,default = 16,help = "number of formulas searched for a shard")
+    parser.add_argument("--complexity",type = int,default = 5,help = "complexity of the generated formulas")
+    parser.add_argument("--max-nodes",type = int,default = 500,help = "limit of expanded states per formula")
+    parser.add_argument("--batch-size",type = int,default = 64,help = "size of the training minibatches")
+    parser.add_argument("--batches",type = int,default = 32,help = "number of minibatches trained on after every shard")
+    parser.add_argument("--publish-every",type = int,default = 1,help = "number of shards after which the weights are published")
+    parser.add_argument("--seed",type = int,default = 0,help = "seed of the first shard, the others follow")
+    args = parser.parse_args()
+
+    for summary in learn(args.shards,args.directory,args.workers,args.episodes,args.complexity,args.max_nodes,
+                         args.batch_size,args.batches,args.publish_every,seed = args.seed):
+        sys.stdout.write(json.dumps(summary) + "\n")
+        sys.stdout.flush()
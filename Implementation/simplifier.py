@@ -0,0 +1,80 @@
+import weakref
+from connectives import *
+
+# Simplified versions of formulas
+# Formulas are interned and immutable, so every formula is simplified only once
+# Formulas which are already simplified map to None, a reference to themselves would keep them alive forever
+simplified = weakref.WeakKeyDictionary()
+
+def simplified_version(formula:Connective) -> Connective:
+    # Memoized simplified version of the formula
+    result = simplified[formula]
+    return formula if result is None else result
+
+def fold(formula:Connective) -> Connective:
+    # Simplify the formula with truth constants among its (already simplified) operands
+    # True is represented by And(), false by Or()
+    true, false = And(), Or()
+    if isinstance(formula,Literal): return formula
+    if isinstance(formula,Quantifier):
+        return formula.successor if formula.successor is true or formula.successor is false else formula
+    if isinstance(formula,Not):
+        if formula.operand is true: return false
+        if formula.operand is false: return true
+        return formula
+    operands = formula.operands
+    if isinstance(formula,And) or isinstance(formula,Or):
+        # Neutral constants are dropped, absorbing ones decide the gate
+        neutral, absorbing = (true,false) if isinstance(formula,And) else (false,true)
+        if absorbing in operands: return absorbing
+        operands = [operand for operand in operands if operand is not neutral]
+        if len(operands) == 1: return operands[0]
+        return formula.__class__(*operands)
+    # Xor: false operands are dropped, a true operand of a binary xor negates the other one
+    operands = [operand for operand in operands if operand is not false]
+    if len(operands) == 2 and true in operands:
+        other = operands[1] if operands[0] is true else operands[0]
+        return fold(Not(other))
+    if not operands: return false
+    if len(operands) == 1: return operands[0]
+    return Xor(*operands)
+
+def simplify_node(formula:Connective) -> Connective:
+    # Simplify the formula whose operands are already simplified
+    if isinstance(formula,Not):
+        # Collapse double negation
+        if isinstance(formula.operand,Not): return formula.operand.operand
+        return fold(formula)
+    if isinstance(formula,And) or isinstance(formula,Or):
+        # Flatten nested gates of the same kind and drop duplicate operands
+        operands = []
+        for operand in formula.operands:
+            operands += operand.operands if operand.__class__ is formula.__class__ else [operand]
+        operands = list(dict.fromkeys(operands))
+        # A formula together with its negation makes And false and Or true
+        present = set(operands)
+        for operand in operands:
+            if isinstance(operand,Not) and operand.operand in present:
+                return Or() if isinstance(formula,And) else And()
+        return fold(formula.__class__(*operands))
+    return fold(formula)
+
+def simplify(formula:Connective) -> Connective:
+    # Constant folding, flattening of And and Or, removal of duplicate operands,
+    # detection of complementary operands and collapse of double negations
+    # Operands are simplified first, without recursion on deep formulas
+    for node in postorder(formula,simplified):
+        if isinstance(node,Literal):
+            simplified[node] = None
+            continue
+        # Rebuild the node from the simplified operands, interning gives back the node itself if none of them changed
+        if isinstance(node,Quantifier): rebuilt = node.__class__(*node.variables,successor = simplified_version(node.successor))
+        elif isinstance(node,Not): rebuilt = Not(simplified_version(node.operand))
+        else: rebuilt = node.__class__(*[simplified_version(child) for child in node.operands])
+        result = simplify_node(rebuilt)
+        # A new node built by the simplification may allow further simplification
+        if result is not rebuilt: result = simplify(result)
+        simplified[result] = None
+        simplified[node] = None if result is node else result
+        if rebuilt is not node: simplified[rebuilt] = None if result is rebuilt else result
+    return simplified_version(formula)
@@ -1,148 +1,90 @@
 from formula_parser import parse
-from rules import State, EliminateDoubleNegation,NegateSequent
-from connectives import Literal, Not
-import random
+from search import Search, PROVED, NOT_FOUND, BUDGET_EXHAUSTED, CANCELLED
+from parallel import ParallelSearch
+from transposition import TranspositionTable
+from model import RLModel, GuidedSearch
+from bestfirst import BestFirstSearch, depth_cost, size_cost, model_cost
+import sys, time, torch
 
-transposition_table = {}
+# Results of already searched states, limited in size so that refutable formulas do not exhaust memory
+transposition_table = TranspositionTable(max_bytes = 2**30)
 
-# Define different solving approaches
+class SearchResult:
 
-# Solve by brute force - the only one so far 
-def brute_force(state):
-    proof = str(state)
+    def __init__(self,status,proof,stats) -> None:
+        # One of PROVED, NOT_FOUND, BUDGET_EXHAUSTED and CANCELLED
+        self.status = status
+        self.proof = proof
+        # Counters of the search and of its transposition table
+        self.stats = stats
 
-    #  **** DOES THE STATE FIT THE AXIOMS? **** 
-    # Check whether the given state already fit axioms
-    fiting_axiom = state.fitAxioms()
-    # If true, return the state together with fulfilled axiom
-    if fiting_axiom:
-        return f"{proof}\n{fiting_axiom}"
-    # If not, save the current state to transpostition table as 'yet unsolved'
-    transposition_table[hash(state)] = ""
+    def __bool__(self) -> bool:
+        return self.status == PROVED
 
+# Search for a proof of the state within the given budget
+# max_nodes limits the number of expanded states, timeout the time in seconds
+# The search stops soon after cancel_event (e.g. threading.Event) gets set
+# Given seed makes the order of actions, and so the whole search, reproducible
+# Given instrumentation.Instrumentation collects statistics of rules and axioms
+# With simplify set, formulas are simplified after every application of an action
+# Given model.RLModel orders the actions by the qualities it predicts
+def solve(state,max_nodes = None,timeout = None,cancel_event = None,transposition_table = None,seed = None,instrumentation = None,simplify = False,model = None):
+    if transposition_table is None: transposition_table = TranspositionTable(max_bytes = 2**30)
+    if model is None: search = Search(transposition_table,seed = seed,instrumentation = instrumentation,simplify = simplify)
+    else: search = GuidedSearch(transposition_table,model,seed = seed,instrumentation = instrumentation,simplify = simplify)
+    start = time.monotonic()
+    deadline = None if timeout is None else start + timeout
+    cancelled = None if cancel_event is None else cancel_event.is_set
+    proof = search.run(state,max_nodes = max_nodes,deadline = deadline,cancelled = cancelled)
+    stats = {"nodes":search.nodes,"steps":search.steps,"time":time.monotonic() - start,**transposition_table.stats()}
+    return SearchResult(search.status,proof,stats)
 
-    #  **** GET ALL POSSIBLE ACTIONS **** 
-    # Get all applicable actions and shuffle them
-    possible_actions = state.possibleActions()
-    random.shuffle(possible_actions)
+# Define different solving approaches
 
-    # Some heuristics needed to make brute force at least somewhat useful
-    # Heuristics: if possible, eliminate double negation
-    if EliminateDoubleNegation in possible_actions:
-        possible_actions.insert(0, possible_actions.pop(possible_actions.index(EliminateDoubleNegation)))
-    # Heuristics: sequent negation is the least preferred operation
-    if NegateSequent in possible_actions:
-        possible_actions.remove(NegateSequent)
-        nonliteral_knowledge = False
-        # And is forbidden, if there are only (negated) literals in the knowledge base
-        for formula in state.formulas[:-1]:
-            if not isinstance(formula,Literal) and (not isinstance(formula,Not) or (not isinstance(formula.operand, Literal) and not isinstance(formula.operand, Not))):
-                nonliteral_knowledge = True
-                break
-        if nonliteral_knowledge:possible_actions.append(NegateSequent)
+# Solve by brute force - the only one so far 
+def brute_force(state,max_depth = None,instrumentation = None):
+    search = Search(transposition_table,instrumentation = instrumentation)
+    # With max_depth given, search by iterative deepening up to that proof depth
+    if max_depth is not None: return search.deepen(state,max_depth)
+    return search.run(state)
 
-    #  **** APPLY ACTIONS ****
-    # Loop actions
-    for action in possible_actions:
-        # For each action, get indices of sequents where it can be applied
-        sequents = action.applicable(state)
-        # Apply action on every possible sequent
-        for sequent in sequents:
-            try:
-                # In case of ExistentialGoal or UniversalAssumption, apply the action for each possible instantiation
-                if action.instantiates():
-                    # Get all possible instantiations
-                    assignments = action.getAssignments(State(*state.formulas),sequent)
-                    # Apply all possible instantiations
-                    result = []
-                    for replace_dict in assignments: 
-                        result.append(action.apply(State(*state.formulas,deterministic = False),sequent,replace_dict)) 
-                    # Set 
-                # Otherwise simply apply the action
-                else: result = action.apply(State(*state.formulas),sequent)
-            # If a recursion error occurs during action aplication, continue to the next sequent
-            except RecursionError:
-                print("Reccursion error occured")
-                continue
-            # If application of action resulted into list of states, loop it
-            if type(result) == list:
-                # If the list is empty, continue to the next sequent
-                if not len(result):continue
-                # Otherwise start looping
-                prooflist = []
-                for res_state in result:
-                    # If the resulting state was already found, get its result from the transposition table
-                    if hash(res_state) in transposition_table.keys():
-                        subproof = transposition_table[hash(res_state)]
-                    # Otherwise apply brute_force recursively to it
-                    else:
-                        try:
-                            subproof = brute_force(res_state)
-                        # If a recursion error occurs, return "Proof not found"
-                        # We are not searching further, because any other brute_dorce call would cause the same
-                        except RecursionError:
-                            return ""
-                    # If a proof for the branch was found and the action is indeterministic, return the proof
-                    if subproof and not res_state.deterministic:
-                        proof = f"{proof}\n{action.__name__}:\n{subproof}"
-                        transposition_table[hash(state)] = proof
-                        return proof
-                    # If a proof for the branch was not found and the action is deterministic stop looping the sequents
-                    elif not subproof and res_state.deterministic:break
-                    # Otherwise, save the proof
-                    prooflist.append(subproof)
-                # If the action is deterministc and proofs were found for all its branches, combine those proofs and return them
-                else:
-                    if res_state.deterministic:
-                        subproof = ""
-                        # Combine the proofs
-                        for b,branch in enumerate(prooflist):
-                            subproof += f"\nBranch {b}:"
-                            subproof += ("\n"+branch).replace("\n","\n  ")
-                        proof = f"{proof}\n{action.__name__}:{subproof}"
-                        # Add the found proof to the transposition table
-                        transposition_table[hash(state)] = proof 
-                        # Return the proof 
-                        return proof
-            # If application of action resulted into a single state, inspect it
-            else:
-                # If the resulting state was already found, get its result from the transposition table
-                if hash(result) in transposition_table.keys():
-                    subproof = transposition_table[hash(result)]
-                # Otherwise apply brute_force recursively to it
-                else:
-                    try:
-                        subproof = brute_force(result)
-                    except RecursionError:
-                        return ""
-                # If the proof of resulting state was found, return it
-                if subproof: 
-                    proof = f"{proof}\n{action.__name__}:\n{subproof}"
-                    # Update the entry in the transposition table
-                    transposition_table[hash(state)] = proof
-                    return proof
+# Solve by brute force, searching the branches in parallel by a pool of worker processes
+def parallel_brute_force(state,workers = None,split_depth = 2):
+    return ParallelSearch(workers,split_depth).run(state)
 
-    # If no of the actions resulted into proof, return "proof not found" 
-    return ""
+# Solve by best-first search, expanding the cheapest states by the given cost first:
+# depth_cost, size_cost, model_cost(model) or any function cost(state, depth, parent, action)
+# States costing more than max_cost are not expanded, with beam_width only the cheapest alternatives of every state are searched
+def best_first(state,cost = depth_cost,beam_width = None,max_cost = None,max_nodes = None,timeout = None,seed = None,simplify = False):
+    search = BestFirstSearch(cost,beam_width,max_cost,seed = seed,simplify = simplify)
+    start = time.monotonic()
+    deadline = None if timeout is None else start + timeout
+    proof = search.run(state,max_nodes = max_nodes,deadline = deadline)
+    stats = {"nodes":search.nodes,"steps":search.steps,"cutoffs":search.cutoffs,"time":time.monotonic() - start}
+    return SearchResult(search.status,proof,stats)
 
-# Data:Graph node
-# Return: proof found ? True : False
-def reinforcement_tree_search(state):
-    if state.fitAxioms():
-        return True
-    actions = state.possibleActions()
-    if actions.length == 0:
-        return False
-    actions.sort(key = lambda action: state.evaluateAction(action))
-    for action in actions[-2:]:
-        if reinforcement_tree_search(state.applyAction(action)):
-            return True
-    return False 
+# Load a model saved by RLModel.save for solving
+# threads sets the number of threads torch uses for a single evaluation, script compiles the model by TorchScript
+def load_model(checkpoint,threads = None,script = False):
+    if threads is not None: torch.set_num_threads(threads)
+    model = RLModel.load(checkpoint)
+    model.eval()
+    if script: model.script()
+    return model
 
-# Parse the given file 
-state = parse(input("File directory:"))
-# Find proof via brute force
-proof = brute_force(state)
-# Print the result
-print(proof if proof else "Proof not found")
+# Solve by the search guided by a trained RL model - a model.RLModel or a path to its checkpoint
+# Only inference is run, the model does not learn from the search
+def guided(state,model,max_nodes = None,timeout = None,threads = None,script = False,**options):
+    if not isinstance(model,RLModel): model = load_model(model,threads,script)
+    elif threads is not None: torch.set_num_threads(threads)
+    with torch.inference_mode():
+        return solve(state,max_nodes = max_nodes,timeout = timeout,model = model,**options)
 
+if __name__ == "__main__":
+    # Parse the given file 
+    state = parse(input("File directory:"))
+    # Find proof guided by the model, if its checkpoint is given as an argument, otherwise via brute force
+    proof = guided(state,sys.argv[1]).proof if len(sys.argv) > 1 else brute_force(state)
+    # Write the result
+    if proof: proof.write(sys.stdout)
+    else: print("Proof not found")
@@ -3,13 +3,13 @@ from connectives import *
 import numpy as np
 
 def generate_formula(complexity):
-    # Prepare variables
-    Literal.used_tokens = []
+    # Prepare variables, every formula has its own literals
+    table = SymbolTable()
     possible_connectives = [And,Or,Xor]
     vertical_complexity = complexity
     horizontal_complexity = (2,4)
     # Generate top level
-    top_tokens = {Literal(str(i)) if np.random.randint(2) else Not(Literal(str(i))) for i in range(0,np.random.randint(*horizontal_complexity))}
+    top_tokens = {table.literal(str(i)) if np.random.randint(2) else Not(table.literal(str(i))) for i in range(0,np.random.randint(*horizontal_complexity))}
     formula = np.random.choice(possible_connectives, p=[0.47,0.47,0.06])(*top_tokens)
     if np.random.randint(0,2): 
         formula = np.random.choice([And(formula,Not(formula),formula,Not(formula)),Or(formula,And()), Not(And(formula,Not(formula)))])
@@ -20,7 +20,7 @@ def generate_formula(complexity):
         top_tokens -= tokens_to_replace
         choose_replacements = set(np.random.choice(list(top_tokens),min([len(top_tokens),3]))) | {And,Or,Xor}
         replace_dict = {}
-        new_tokens = {Literal(str(i)) if np.random.randint(2) else Not(Literal(str(i))) for i in range(level*horizontal_complexity[1],(level+1)*horizontal_complexity[1])}
+        new_tokens = {table.literal(str(i)) if np.random.randint(2) else Not(table.literal(str(i))) for i in range(level*horizontal_complexity[1],(level+1)*horizontal_complexity[1])}
         for tr in tokens_to_replace:
             replacement = np.random.choice(list(choose_replacements))
             if isinstance(replacement,type):
@@ -28,6 +28,6 @@ def generate_formula(complexity):
                 
             replace_dict[tr] = replacement
         top_tokens |= new_tokens
-        Action.recursive_replacement(formula, replace_dict, True)
+        formula = Action.recursive_replacement(formula, replace_dict)
         level += 1
     return State(Not(formula),Or())
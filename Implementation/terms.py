@@ -0,0 +1,71 @@
+import weakref
+from collections import Counter, OrderedDict
+from connectives import Literal, Quantifier, children, postorder
+
+# Numbers of free occurrences of literals in already counted formulas
+# Formulas are interned and immutable, so the counts are computed once per formula
+occurrences = weakref.WeakKeyDictionary()
+
+def free_occurrences(formula) -> Counter:
+    # Count free occurrences of literals in the formula, without recursion on deep formulas
+    for node in postorder(formula,occurrences):
+        if isinstance(node,Literal):
+            occurrences[node] = Counter({node:1})
+            continue
+        counts = Counter()
+        for child in children(node): counts.update(occurrences[child])
+        # Variables of a quantifier are not free in it
+        if isinstance(node,Quantifier):
+            for variable in node.variables: counts.pop(variable,None)
+        occurrences[node] = counts
+    return occurrences[formula]
+
+def occurrence_ranking(state,counts) -> list:
+    # Literals occuring more often in the sequent come first
+    return sorted(counts,key = lambda literal: (-counts[literal],literal.value))
+
+# Provider of terms quantified variables get instantiated with:
+# only literals occuring free in the sequent, ordered by the ranking function
+# ranking(state, counts) gets the numbers of free occurrences of the literals and returns them ordered,
+# e.g. by qualities predicted by the RL model
+class TermProvider:
+
+    def __init__(self,ranking = occurrence_ranking,max_entries = 2**16) -> None:
+        self.ranking = ranking
+        # Ranked candidates of recently seen states by their keys
+        self.cache = OrderedDict()
+        self.max_entries = max_entries
+        # Literal used when the sequent has no free literals
+        self.fresh = None
+
+    def rankedTerms(self,state) -> list:
+        key = state.key
+        terms = self.cache.get(key)
+        if terms is not None:
+            self.cache.move_to_end(key)
+            return terms
+        counts = Counter()
+        for formula in state.formulas: counts.update(free_occurrences(formula))
+        terms = self.ranking(state,counts)
+        self.cache[key] = terms
+        if len(self.cache) > self.max_entries: self.cache.popitem(last = False)
+        return terms
+
+    def candidates(self,state,formula) -> list:
+        # Terms for the variables of the quantifier at the given position
+        # Exclude those bounded by the quantifier or by its successors
+        quantifier = state.formulas[formula]
+        excluded = set(quantifier.variables).union(quantifier.successor.getBoundedLiterals())
+        terms = [term for term in self.rankedTerms(state) if term not in excluded]
+        # Without any free literal in the sequent, instantiate with a fresh one
+        # It is shared by all such states of the problem, so that their instantiations do not differ just by its name
+        if not terms:
+            table = quantifier.variables[0].table
+            if self.fresh is None or self.fresh.table is not table or self.fresh in excluded:
+                self.fresh = table.fresh(skolemn = True)
+            terms = [self.fresh]
+        return terms
+
+    def clear(self) -> None:
+        self.cache.clear()
+        self.fresh = None
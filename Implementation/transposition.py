@@ -0,0 +1,124 @@
+import sys
+from collections import OrderedDict
+
+# Kinds of transposition table entries
+PROVED = "proved"
+FAILED = "failed"
+IN_PROGRESS = "in progress"
+
+class Entry:
+
+    __slots__ = ("kind","proof","depth","horizon","size")
+
+    def __init__(self,kind,proof,depth,horizon,size) -> None:
+        self.kind = kind
+        self.proof = proof
+        # Distance of the entry's state from the root of the search
+        self.depth = depth
+        # Failures found under a depth limit hold only up to this many steps below the state, None means always
+        self.horizon = horizon
+        # Estimated memory taken by the entry
+        self.size = size
+
+class TranspositionTable:
+
+    # Estimated memory taken by an entry apart from its proof
+    # Proof steps are shared between entries, so only the top step is counted,
+    # together with its tuples of formulas and children (formula nodes are interned and shared as well)
+    entry_overhead = 200
+
+    @staticmethod
+    def proof_size(proof) -> int:
+        if proof is None: return 0
+        return sys.getsizeof(proof) + sys.getsizeof(proof.formulas) + sys.getsizeof(proof.children)
+
+    # Number of the oldest entries compared by the depth-preferred policy
+    depth_sample = 8
+
+    # Replacement policies:
+    # lru - evict the least recently used entry
+    # depth - evict the deepest of the oldest entries, reject the new entry if it is deeper than all of them
+    # always - always store the new entry, evict the oldest one
+    policies = ("lru","depth","always")
+
+    def __init__(self,max_entries = None,max_bytes = None,policy = "lru") -> None:
+        if policy not in TranspositionTable.policies:
+            raise ValueError(f"Unknown replacement policy '{policy}', use one of {TranspositionTable.policies}")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.policy = policy
+        # Finished entries, ordered from the oldest (or least recently used) one
+        self.entries = OrderedDict()
+        # States on the current search path are kept aside, they are never evicted
+        self.in_progress = {}
+        # Statistics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.resident_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self.entries) + len(self.in_progress)
+
+    def lookup(self,key):
+        # Return entry stored for the given key, or None if there is no such entry
+        entry = self.in_progress.get(key)
+        if entry is None:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if self.policy == "lru": self.entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def begin(self,key,depth = 0) -> None:
+        # Mark the state as being searched
+        self.in_progress[key] = Entry(IN_PROGRESS,None,depth,None,0)
+
+    def store(self,key,kind,proof = None,depth = 0,horizon = None) -> None:
+        # The state is not being searched anymore
+        self.in_progress.pop(key,None)
+        if key in self.entries: self.remove(key)
+        size = TranspositionTable.entry_overhead + TranspositionTable.proof_size(proof)
+        # Make space for the new entry
+        while self.entries and self.full(size):
+            victim = self.victim(depth)
+            # The depth-preferred policy may decide not to store the entry at all
+            if victim is None: return
+            self.remove(victim)
+            self.evictions += 1
+        self.entries[key] = Entry(kind,proof,depth,horizon,size)
+        self.resident_bytes += size
+
+    def full(self,size) -> bool:
+        if self.max_entries is not None and len(self.entries) >= self.max_entries: return True
+        if self.max_bytes is not None and self.resident_bytes + size > self.max_bytes: return True
+        return False
+
+    def victim(self,depth):
+        # Oldest entry is replaced by the lru and always-replace policies
+        if self.policy != "depth": return next(iter(self.entries))
+        # Find the deepest of the oldest entries
+        victim, victim_depth = None, -1
+        for s,(key,entry) in enumerate(self.entries.items()):
+            if s == TranspositionTable.depth_sample: break
+            if entry.depth > victim_depth: victim, victim_depth = key, entry.depth
+        # Entries closer to the root summarize larger searches, so the new entry has to be at least as shallow
+        return victim if victim_depth >= depth else None
+
+    def remove(self,key) -> None:
+        self.resident_bytes -= self.entries.pop(key).size
+
+    def abandon(self) -> None:
+        # Forget states whose search was interrupted
+        self.in_progress.clear()
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.in_progress.clear()
+        self.resident_bytes = 0
+
+    def stats(self) -> dict:
+        return {"hits":self.hits,"misses":self.misses,"evictions":self.evictions,
+                "entries":len(self.entries),"resident_bytes":self.resident_bytes}